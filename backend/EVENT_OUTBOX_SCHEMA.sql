@@ -0,0 +1,37 @@
+-- Event Outbox Schema for Pollu-Stake
+-- Run this SQL in your NeonDB console to create the table backing the
+-- in-process event bus (backend/events.py).
+
+-- One row per (event, consumer) delivery
+CREATE TABLE IF NOT EXISTS event_outbox (
+    id VARCHAR(64) PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,      -- 'SlashTriggered', 'ForecastAlert', 'StatusChanged'
+    consumer VARCHAR(100) NOT NULL,        -- handler name, e.g. 'handle_slash'
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING', -- 'PENDING', 'DONE', 'FAILED'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    processed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- The replay task only ever scans pending deliveries that are due
+CREATE INDEX IF NOT EXISTS idx_event_outbox_pending
+    ON event_outbox (next_attempt_at)
+    WHERE status = 'PENDING';
+
+-- Retention cleanup deletes processed deliveries by age
+CREATE INDEX IF NOT EXISTS idx_event_outbox_done
+    ON event_outbox (processed_at)
+    WHERE status = 'DONE';
+
+-- Slash handling inserts with ON CONFLICT (tx_hash) to stay idempotent on
+-- redelivery, so tx_hash must be unique. Replaces the earlier non-unique
+-- index of the same name. If this fails, find duplicate hashes with:
+--   SELECT tx_hash, COUNT(*) FROM slash_events GROUP BY tx_hash HAVING COUNT(*) > 1;
+DROP INDEX IF EXISTS idx_slash_events_tx_hash;
+CREATE UNIQUE INDEX idx_slash_events_tx_hash ON slash_events (tx_hash);
+
+-- Verify table was created
+SELECT 'Event Outbox Schema Created Successfully' as status;
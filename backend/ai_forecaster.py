@@ -1,4 +1,3 @@
-from tensorflow.keras.models import load_model
 import joblib
 import numpy as np
 from typing import List
@@ -7,40 +6,88 @@ class LSTMForecaster:
     """
     This class loads a pre-trained Keras LSTM model and its associated
     scaler to make predictions on new, live data.
+
+    Pass load=False to defer the (slow) TensorFlow import and model load;
+    call load() and warm_up() later, e.g. from a background thread.
     """
-    def __init__(self, model_path, scaler_path, breach_threshold=150.0):
+    def __init__(self, model_path, scaler_path, breach_threshold=150.0, look_back=20, lead=3, load=True):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.breach_threshold = breach_threshold
+        self.look_back = look_back  # Replaced by the model's input shape once loaded
+        self.horizon = 1            # Replaced by the model's output shape once loaded
+        self.lead = lead            # Steps ahead used for the headline forecast / breach check
+        self.model = None
+        self.scaler = None
+        self.ready = False
+        self.load_error = None      # Why load() failed, if it did
+        if load:
+            self.load()
+
+    def load(self) -> bool:
+        """
+        Imports TensorFlow and loads the model and scaler from disk.
+        Returns True on success; on failure the forecaster stays unloaded.
+        """
         print("Loading LSTM model and scaler...")
         try:
-            self.model = load_model(model_path)
-            self.scaler = joblib.load(scaler_path)
+            # Imported here so that importing this module doesn't pull in TensorFlow
+            from tensorflow.keras.models import load_model
+
+            self.model = load_model(self.model_path)
+            self.scaler = joblib.load(self.scaler_path)
             
             # Get LOOK_BACK from the model's input shape
             self.look_back = self.model.input_shape[1] 
+            # Multi-horizon models output the next HORIZON steps; legacy
+            # models output a single value already LOOK_FORWARD steps ahead.
+            self.horizon = self.model.output_shape[-1]
             
-            self.breach_threshold = breach_threshold
-            print(f"Model loaded. Expecting {self.look_back} time steps.")
+            self.ready = True
+            print(f"Model loaded. Expecting {self.look_back} time steps, forecasting {self.horizon}.")
         except Exception as e:
             print(f"CRITICAL ERROR: Could not load model or scaler. {e}")
+            self.load_error = f"{type(e).__name__}: {e}"
             self.model = None
             self.scaler = None
+        return self.ready
 
-    def predict_breach(self, data_history: List[float]) -> tuple[bool, float]:
+    def warm_up(self):
         """
-        Predicts if a breach will occur using the loaded LSTM.
+        Runs one throwaway inference so the first real prediction doesn't
+        pay for graph tracing and kernel initialization.
+        """
+        if not self.ready:
+            return
+        dummy = np.zeros((1, self.look_back, 1), dtype=np.float32)
+        self.model.predict(dummy, verbose=0)
+        print("Model warm-up inference complete.")
+
+    def lead_index(self) -> int:
+        """ Index into a trajectory of the headline (lead-steps-ahead) value. """
+        if self.horizon == 1:
+            return 0
+        return min(self.lead, self.horizon) - 1
+
+    def predict_trajectory(self, data_history: List[float]) -> np.ndarray:
+        """
+        Forecasts the next `horizon` PM2.5 values from a single model pass.
         
         Args:
             data_history: A list of the most recent PM2.5 readings.
             
         Returns:
-            A tuple (bool: breach_predicted, float: predicted_value)
+            An array of `horizon` predicted values, where index i is the
+            reading i+1 steps after the last one in data_history. Empty if
+            the model isn't loaded or there isn't enough history.
         """
         if not self.model or not self.scaler:
-            return (False, 0.0)
+            return np.empty(0)
 
         if len(data_history) < self.look_back:
             # Not enough data to make a prediction
             print(f"Warning: Not enough data. Need {self.look_back}, got {len(data_history)}")
-            return (False, 0.0)
+            return np.empty(0)
             
         try:
             # 1. Get the last 'look_back' points
@@ -53,18 +100,58 @@ class LSTMForecaster:
             # (1 sample, 'look_back' timesteps, 1 feature)
             input_data = scaled_data.reshape((1, self.look_back, 1))
             
-            # 4. Make prediction
-            predicted_scaled = self.model.predict(input_data)
+            # 4. Make prediction: shape (1, horizon)
+            predicted_scaled = self.model.predict(input_data, verbose=0)
             
             # 5. Inverse transform the prediction
-            # This converts the 0-1 value back to a real PM2.5 value
-            predicted_value = self.scaler.inverse_transform(predicted_scaled)[0][0]
-            
-            # 6. Check for breach
-            breach = predicted_value > self.breach_threshold
-            
-            return (bool(breach), float(round(predicted_value, 2)))
+            # The scaler was fit on one column, so transform the steps as rows
+            predicted = self.scaler.inverse_transform(predicted_scaled.reshape(-1, 1))
+            return np.round(predicted.reshape(-1), 2)
                 
         except Exception as e:
             print(f"Error during LSTM prediction: {e}")
-            return (False, 0.0)
\ No newline at end of file
+            return np.empty(0)
+
+    def predict_trajectories(self, windows: np.ndarray) -> np.ndarray:
+        """
+        Batched predict_trajectory(): one model pass for many factories.
+        
+        Args:
+            windows: Array of shape (n_factories, look_back), chronological.
+            
+        Returns:
+            Array of shape (n_factories, horizon), or an empty (0, horizon)
+            array if the model isn't loaded or prediction fails.
+        """
+        windows = np.asarray(windows, dtype=np.float64)
+        if not self.model or not self.scaler or len(windows) == 0:
+            return np.empty((0, self.horizon))
+
+        try:
+            windows = windows[:, -self.look_back:]
+            scaled = self.scaler.transform(windows.reshape(-1, 1))
+            input_data = scaled.reshape((len(windows), self.look_back, 1))
+            predicted_scaled = self.model.predict(input_data, verbose=0)
+            predicted = self.scaler.inverse_transform(predicted_scaled.reshape(-1, 1))
+            return np.round(predicted.reshape(len(windows), -1), 2)
+        except Exception as e:
+            print(f"Error during batched LSTM prediction: {e}")
+            return np.empty((0, self.horizon))
+
+    def predict_breach(self, data_history: List[float]) -> tuple[bool, float]:
+        """
+        Predicts if a breach will occur using the loaded LSTM.
+        
+        Args:
+            data_history: A list of the most recent PM2.5 readings.
+            
+        Returns:
+            A tuple (bool: breach_predicted, float: predicted_value)
+        """
+        trajectory = self.predict_trajectory(data_history)
+        if len(trajectory) == 0:
+            return (False, 0.0)
+
+        predicted_value = float(trajectory[self.lead_index()])
+        breach = predicted_value > self.breach_threshold
+        return (bool(breach), predicted_value)
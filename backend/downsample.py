@@ -0,0 +1,92 @@
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def _bucket_edges(n: int, n_buckets: int) -> np.ndarray:
+    """ n_buckets + 1 integer edges splitting range(n) into near-equal buckets. """
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max bucketing: splits the series into n_out // 2 buckets and keeps
+    each bucket's minimum and maximum, so spikes are never averaged away.
+    Fully vectorized: buckets are laid out as rows of a padded 2-D array
+    and reduced with argmin/argmax along the rows.
+
+    Returns:
+        Sorted indices into y, at most n_out of them.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    n_buckets = max(1, n_out // 2)
+    edges = _bucket_edges(n, n_buckets)
+    sizes = np.diff(edges)
+    bucket = np.repeat(np.arange(n_buckets), sizes)
+    column = np.arange(n) - edges[bucket]
+
+    grid = np.full((n_buckets, sizes.max()), np.inf)
+    grid[bucket, column] = y
+    mins = edges[:-1] + np.argmin(grid, axis=1)
+    grid[bucket, column] = -y  # Reuse the buffer: padding stays +inf, so argmin of -y is argmax of y
+    maxs = edges[:-1] + np.argmin(grid, axis=1)
+    return np.unique(np.concatenate([mins, maxs]))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last points and, in
+    each bucket in between, the point forming the largest triangle with the
+    previously kept point and the next bucket's average. Preserves the
+    visual shape of the series far better than striding or averaging.
+    Each bucket is reduced with NumPy; the loop is over buckets only.
+
+    Returns:
+        Sorted indices into x/y, exactly min(n_out, len(x)) of them.
+    """
+    n_out = max(n_out, 3)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = n_out - 2
+    edges = _bucket_edges(n - 2, n_buckets) + 1  # Buckets cover 1 .. n-2
+
+    # Per-bucket averages via reduceat (the last "next bucket" is the final point)
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for b in range(n_buckets):
+        lo, hi = edges[b], edges[b + 1]
+        # Twice the triangle area, vectorized over every candidate in the bucket
+        area = np.abs(
+            (x[prev] - avg_x[b + 1]) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y[b + 1] - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> np.ndarray:
+    """
+    Picks which readings to keep so a series of any length renders as
+    about n_out points. Index the other fields with the result so every
+    series on a chart shares the same timestamps.
+    """
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    if method == "lttb":
+        return lttb_indices(x, y, n_out)
+    raise ValueError(f"Unknown downsampling method '{method}'. Use one of {DOWNSAMPLE_METHODS}")
@@ -0,0 +1,97 @@
+import gzip
+import json
+import uuid
+from decimal import Decimal
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+# Optional faster/smaller encoders; each falls back to the standard library.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+COMPRESS_MIN_BYTES = 1024  # Smaller bodies aren't worth the CPU
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4          # Fast setting; still beats gzip on JSON
+
+
+def _default(obj):
+    """ Serializes the types our payloads contain that json/msgpack don't know. """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Decimal):
+        # NUMERIC columns from asyncpg (e.g. compliance_score)
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def _accepts(header: str, token: str) -> bool:
+    """ True if an Accept/Accept-Encoding header lists `token` with a non-zero q-value. """
+    for part in header.split(","):
+        name, *params = part.split(";")
+        if name.strip().lower() != token:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            return True
+    return False
+
+
+def encode_response(request: Request, payload, status_code: int = 200) -> Response:
+    """
+    Encodes a payload by content negotiation: msgpack when the client
+    Accepts it (and msgpack is installed), JSON otherwise; then brotli or
+    gzip per Accept-Encoding for bodies over COMPRESS_MIN_BYTES.
+    """
+    accept = request.headers.get("accept", "")
+    if msgpack is not None and any(_accepts(accept, t) for t in MSGPACK_TYPES):
+        body = msgpack.packb(payload, default=_default, use_bin_type=True)
+        media_type = "application/msgpack"
+    else:
+        body = dumps_json(payload)
+        media_type = "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accept_encoding = request.headers.get("accept-encoding", "")
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif _accepts(accept_encoding, "gzip"):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
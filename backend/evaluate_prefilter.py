@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import time
+
+from ai_forecaster import LSTMForecaster
+from tiered_forecaster import statistical_forecast
+
+# --- Configuration ---
+DATA_FILE = "training_data.csv"
+FORECAST_ALERT_THRESHOLD = 150.0  # Must match main.py
+MARGINS = [10.0, 20.0, 30.0, 40.0, 60.0]
+
+# Measures, on recorded data, what the statistical pre-filter in
+# tiered_forecaster.py costs in alert recall for each margin: the LSTM's
+# own alerts on every window are the reference.
+print("Loading model and data...")
+forecaster = LSTMForecaster(
+    model_path="lstm_model.keras",
+    scaler_path="scaler.joblib",
+    breach_threshold=FORECAST_ALERT_THRESHOLD
+)
+pm_data = pd.read_csv(DATA_FILE)["pm2_5"].values.astype(float)
+windows = sliding_window_view(pm_data, forecaster.look_back)
+print(f"{len(windows)} windows of {forecaster.look_back} readings.")
+
+start_time = time.time()
+trajectories = forecaster.predict_trajectories(windows)
+lstm_alerts = trajectories[:, forecaster.lead_index()] > FORECAST_ALERT_THRESHOLD
+print(f"LSTM on all windows took {time.time() - start_time:.2f} seconds, {int(lstm_alerts.sum())} alerts.")
+
+start_time = time.time()
+cheap = statistical_forecast(windows, forecaster.lead)[:, forecaster.lead - 1]
+print(f"Statistical forecast on all windows took {time.time() - start_time:.4f} seconds.")
+
+print(f"{'margin':>8} {'LSTM avoided':>14} {'alert recall':>14}")
+for margin in MARGINS:
+    near = np.maximum(cheap, windows[:, -1]) >= FORECAST_ALERT_THRESHOLD - margin
+    avoided = 1.0 - near.mean()
+    recall = (lstm_alerts & near).sum() / lstm_alerts.sum() if lstm_alerts.any() else 1.0
+    print(f"{margin:>8.1f} {avoided:>14.1%} {recall:>14.1%}")
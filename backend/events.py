@@ -0,0 +1,307 @@
+import asyncio
+import dataclasses
+import json
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Type
+
+import asyncpg
+
+
+# --- Event types ---
+@dataclass
+class Event:
+    event_id: str = field(default_factory=lambda: uuid.uuid4().hex, kw_only=True)
+    created_at: float = field(default_factory=time.time, kw_only=True)
+
+
+@dataclass
+class SlashTriggered(Event):
+    factory_id: str
+    pm2_5: float
+    amount: float
+
+
+@dataclass
+class ForecastAlert(Event):
+    factory_id: str
+    predicted_value: float
+    threshold: float
+
+
+@dataclass
+class StatusChanged(Event):
+    factory_id: str
+    old_status: Optional[str]
+    new_status: str
+
+
+EVENT_TYPES: Dict[str, Type[Event]] = {
+    cls.__name__: cls for cls in (SlashTriggered, ForecastAlert, StatusChanged)
+}
+
+Handler = Callable[[Event], Awaitable[None]]
+
+
+class Delivery:
+    """ One event on its way to one consumer; `id` is its event_outbox row. """
+    def __init__(self, delivery_id: str, consumer: str, event: Event, attempts: int = 0):
+        self.id = delivery_id
+        self.consumer = consumer
+        self.event = event
+        self.attempts = attempts
+
+
+class Consumer:
+    def __init__(self, name: str, event_type: Type[Event], handler: Handler, max_queue: int):
+        self.name = name
+        self.event_type = event_type
+        self.handler = handler
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.processed = 0
+        self.failed = 0
+
+
+class EventBus:
+    """
+    In-process event bus with a durable outbox.
+
+    publish() only appends to an in-memory buffer, so the caller never
+    waits on consumers or the database. A flusher task persists buffered
+    events to `event_outbox` (one row per event and consumer) in batches
+    and hands them to each consumer's bounded queue. Failed deliveries are
+    retried with exponential backoff up to `max_attempts`; deliveries that
+    didn't fit in a full queue, or were left over by a previous run, are
+    picked up again from the outbox by a replay task. Delivered (DONE)
+    rows are deleted once they are older than `retention_seconds`.
+
+    The publish buffer holds at most `max_buffer` events: while the outbox
+    can't be written (DB down), further events are dropped and counted in
+    `dropped` rather than growing memory without bound, and failed
+    flushes back off up to `max_flush_backoff` seconds.
+    """
+    def __init__(self, max_attempts: int = 5, retry_backoff: float = 1.0,
+                 flush_interval: float = 0.05, replay_interval: float = 5.0,
+                 retention_seconds: float = 24 * 3600, cleanup_interval: float = 300.0,
+                 max_buffer: int = 10_000, max_flush_backoff: float = 5.0):
+        self.max_attempts = max_attempts
+        self.max_buffer = max_buffer
+        self.max_flush_backoff = max_flush_backoff
+        self.retry_backoff = retry_backoff
+        self.flush_interval = flush_interval
+        self.replay_interval = replay_interval
+        self.retention_seconds = retention_seconds
+        self.cleanup_interval = cleanup_interval
+        self.pool: Optional[asyncpg.Pool] = None
+        self.published = 0
+        self.dropped = 0
+        self.cleaned_up = 0
+        self._flush_failures = 0
+        self._consumers: Dict[str, Consumer] = {}
+        self._buffer: deque = deque()
+        self._done: List[str] = []
+        self._in_flight: set = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, event_type: Type[Event], handler: Handler,
+                  name: Optional[str] = None, max_queue: int = 1000):
+        name = name or handler.__name__
+        self._consumers[name] = Consumer(name, event_type, handler, max_queue)
+
+    def publish(self, event: Event):
+        """
+        Non-blocking: the event is persisted and dispatched by the flusher
+        task. Dropped (and counted) if the buffer is full.
+        """
+        if len(self._buffer) >= self.max_buffer:
+            self._drop(1)
+            return
+        self._buffer.append(event)
+        self.published += 1
+
+    def _drop(self, count: int):
+        before = self.dropped
+        self.dropped += count
+        # Log the first drop and then every 1000th, not every event
+        if before == 0 or before // 1000 != self.dropped // 1000:
+            print(f"Event buffer full ({self.max_buffer} events, outbox not writable): "
+                  f"{self.dropped} events dropped so far")
+
+    async def start(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self._tasks = [asyncio.create_task(self._worker(c)) for c in self._consumers.values()]
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+        self._tasks.append(asyncio.create_task(self._replay_loop()))
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.pool:
+            await self._flush()
+
+    # --- Outbox persistence ---
+    async def _flush(self):
+        if self._buffer:
+            events = [self._buffer.popleft() for _ in range(len(self._buffer))]
+            deliveries = [
+                Delivery(uuid.uuid4().hex, consumer.name, event)
+                for event in events
+                for consumer in self._consumers.values()
+                if isinstance(event, consumer.event_type)
+            ]
+            if deliveries:
+                try:
+                    await self.pool.execute(
+                        """
+                        INSERT INTO event_outbox (id, event_type, consumer, payload)
+                        SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::jsonb[])
+                        """,
+                        [d.id for d in deliveries],
+                        [type(d.event).__name__ for d in deliveries],
+                        [d.consumer for d in deliveries],
+                        [json.dumps(dataclasses.asdict(d.event)) for d in deliveries]
+                    )
+                except Exception as e:
+                    # Keep the events (up to max_buffer, oldest first) and retry with backoff
+                    self._flush_failures += 1
+                    if self._flush_failures == 1 or self._backoff() >= self.max_flush_backoff:
+                        print(f"Error writing event outbox (attempt {self._flush_failures}): {e}")
+                    self._buffer.extendleft(reversed(events))
+                    overflow = len(self._buffer) - self.max_buffer
+                    for _ in range(max(0, overflow)):
+                        self._buffer.pop()
+                    if overflow > 0:
+                        self._drop(overflow)
+                    return
+                self._flush_failures = 0
+                for delivery in deliveries:
+                    self._dispatch(delivery)
+
+        if self._done:
+            done, self._done = self._done, []
+            try:
+                await self.pool.execute(
+                    "UPDATE event_outbox SET status = 'DONE', processed_at = NOW() WHERE id = ANY($1::text[])",
+                    done
+                )
+                self._in_flight.difference_update(done)
+            except Exception as e:
+                print(f"Error marking outbox events done: {e}")
+                self._done.extend(done)
+
+    def _dispatch(self, delivery: Delivery):
+        consumer = self._consumers.get(delivery.consumer)
+        if consumer is None:
+            return
+        try:
+            consumer.queue.put_nowait(delivery)
+            self._in_flight.add(delivery.id)
+        except asyncio.QueueFull:
+            # Stays PENDING in the outbox; the replay task will deliver it later
+            pass
+
+    def _backoff(self) -> float:
+        if not self._flush_failures:
+            return self.flush_interval
+        return min(self.flush_interval * 2 ** min(self._flush_failures, 30), self.max_flush_backoff)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._backoff())
+            await self._flush()
+
+    async def _replay_loop(self):
+        while True:
+            try:
+                rows = await self.pool.fetch(
+                    """
+                    SELECT id, event_type, consumer, payload, attempts
+                    FROM event_outbox
+                    WHERE status = 'PENDING' AND next_attempt_at <= NOW()
+                    ORDER BY created_at
+                    LIMIT 1000
+                    """
+                )
+                for row in rows:
+                    if row['id'] in self._in_flight:
+                        continue
+                    event_cls = EVENT_TYPES.get(row['event_type'])
+                    if event_cls is None:
+                        continue
+                    payload = row['payload']
+                    if isinstance(payload, str):
+                        payload = json.loads(payload)
+                    self._dispatch(Delivery(row['id'], row['consumer'], event_cls(**payload), row['attempts']))
+            except Exception as e:
+                print(f"Error replaying event outbox: {e}")
+            await asyncio.sleep(self.replay_interval)
+
+    async def _cleanup(self):
+        """ Deletes delivered rows past the retention period; PENDING and FAILED rows are kept. """
+        result = await self.pool.execute(
+            """
+            DELETE FROM event_outbox
+            WHERE status = 'DONE' AND processed_at < NOW() - make_interval(secs => $1)
+            """,
+            float(self.retention_seconds)
+        )
+        # asyncpg returns the command tag, e.g. 'DELETE 42'
+        self.cleaned_up += int(result.split()[-1])
+
+    async def _cleanup_loop(self):
+        while True:
+            try:
+                await self._cleanup()
+            except Exception as e:
+                print(f"Error cleaning up event outbox: {e}")
+            await asyncio.sleep(self.cleanup_interval)
+
+    # --- Consumers ---
+    async def _worker(self, consumer: Consumer):
+        while True:
+            delivery = await consumer.queue.get()
+            try:
+                await consumer.handler(delivery.event)
+                consumer.processed += 1
+                self._done.append(delivery.id)
+            except Exception as e:
+                consumer.failed += 1
+                await self._record_failure(delivery, e)
+
+    async def _record_failure(self, delivery: Delivery, error: Exception):
+        delivery.attempts += 1
+        status = 'PENDING' if delivery.attempts < self.max_attempts else 'FAILED'
+        backoff = self.retry_backoff * 2 ** (delivery.attempts - 1)
+        print(f"Consumer {delivery.consumer} failed on {type(delivery.event).__name__} "
+              f"(attempt {delivery.attempts}/{self.max_attempts}): {error}")
+        try:
+            await self.pool.execute(
+                """
+                UPDATE event_outbox
+                SET attempts = $2, status = $3, last_error = $4,
+                    next_attempt_at = NOW() + make_interval(secs => $5)
+                WHERE id = $1
+                """,
+                delivery.id, delivery.attempts, status, str(error), backoff
+            )
+        except Exception as e:
+            print(f"Error recording outbox failure: {e}")
+        # Released so the replay task can pick it up once next_attempt_at passes
+        self._in_flight.discard(delivery.id)
+
+    def stats(self) -> dict:
+        return {
+            "published": self.published,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "in_flight": len(self._in_flight),
+            "cleaned_up": self.cleaned_up,
+            "consumers": {
+                c.name: {"queued": c.queue.qsize(), "processed": c.processed, "failed": c.failed}
+                for c in self._consumers.values()
+            },
+        }
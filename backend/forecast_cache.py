@@ -0,0 +1,109 @@
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class ForecastTrajectory:
+    """
+    A multi-step forecast for one factory. values[i] is the predicted
+    reading i+1 steps after the reading with sequence number `origin`.
+    A legacy single-output model's one value is LOOK_FORWARD steps ahead
+    instead, so it is never read as a curve.
+    """
+    def __init__(self, values: np.ndarray, origin: int, source: str = "lstm"):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.origin = origin
+        self.source = source
+        self.created_at = time.time()
+
+    def remaining(self, seq: int) -> np.ndarray:
+        """ The part of the trajectory that is still in the future at sequence `seq`. """
+        if len(self.values) < 2:
+            return self.values[:0]
+        return self.values[max(0, seq - self.origin):]
+
+
+class TrajectoryCache:
+    """
+    Keeps the latest forecast trajectory per factory so the monitor can
+    reuse one model pass across several ticks. A trajectory stays valid
+    while every reading observed since it was made lies within
+    `tolerance` of what it predicted, and while it still reaches `lead`
+    steps past the newest reading.
+    """
+    def __init__(self, tolerance: float, lead_index: int = 0):
+        self.tolerance = tolerance
+        self.lead_index = lead_index
+        self.inferences = 0
+        self.reuses = 0
+        self._trajectories: Dict[str, ForecastTrajectory] = {}
+
+    def store(self, factory_id: str, values: np.ndarray, seq: int, source: str = "lstm"):
+        self._trajectories[factory_id] = ForecastTrajectory(values, seq, source)
+        self.inferences += 1
+
+    def get(self, factory_id: str) -> Optional[ForecastTrajectory]:
+        return self._trajectories.get(factory_id)
+
+    def reuse(self, factory_id: str, history: List[float], seq: int) -> Optional[float]:
+        """
+        Returns the headline forecast for the reading at sequence `seq`
+        from the cached trajectory, or None if a fresh inference is needed.
+        `history` is the factory's chronological window ending at `seq`.
+        """
+        trajectory = self._trajectories.get(factory_id)
+        if trajectory is None:
+            return None
+
+        steps = seq - trajectory.origin
+        target = steps + self.lead_index
+        if steps <= 0 or target >= len(trajectory.values) or steps > len(history):
+            return None
+
+        observed = np.asarray(history[-steps:], dtype=np.float64)
+        expected = trajectory.values[:steps]
+        if np.any(np.abs(observed - expected) > self.tolerance):
+            # Readings left the band: the trajectory no longer describes reality
+            del self._trajectories[factory_id]
+            return None
+
+        self.reuses += 1
+        return float(trajectory.values[target])
+
+    def stats(self) -> dict:
+        total = self.inferences + self.reuses
+        return {
+            "inferences": self.inferences,
+            "reuses": self.reuses,
+            "reuse_ratio": round(self.reuses / total, 3) if total else 0.0,
+        }
+
+
+class LatestForecasts:
+    """
+    In-memory map of each factory's most recent forecast, kept in step
+    with `forecast_logs` by the monitor so forecast reads need no query.
+    An entry carries the trajectory its predicted value was read from, or
+    None if the value came from the statistical tier or the database.
+    """
+    def __init__(self):
+        self._latest: Dict[str, dict] = {}
+
+    def update(self, factory_id: str, predicted_value: float, breach_predicted: bool, timestamp,
+               trajectory: Optional[ForecastTrajectory] = None):
+        self._latest[factory_id] = {
+            "predicted_value": float(predicted_value),
+            "breach_predicted": bool(breach_predicted),
+            "timestamp": timestamp,
+            "trajectory": trajectory,
+        }
+
+    def get(self, factory_id: str) -> Optional[dict]:
+        return self._latest.get(factory_id)
+
+    def factory_ids(self) -> List[str]:
+        return list(self._latest)
+
+    def __len__(self) -> int:
+        return len(self._latest)
@@ -0,0 +1,144 @@
+import datetime
+import time
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+import numpy as np
+
+from downsample import downsample_indices
+
+HISTORY_DTYPE = np.dtype([
+    ("factory_id", object),
+    ("timestamp", "<f8"),  # Epoch seconds
+    ("pm2_5", "<f8"),
+    ("so2", "<f8"),
+    ("nox", "<f8"),
+])
+
+# Reduces a time range on the DB side: the range is split into $3 equal
+# time buckets per factory and only each bucket's min and max PM2.5
+# readings are returned, with the factory's total reading count. The
+# app never holds more than 2 * $3 rows per factory, however long the range.
+BUCKETED_HISTORY_QUERY = """
+    WITH bucketed AS (
+        SELECT factory_id, timestamp, pm2_5, so2, nox,
+               LEAST(GREATEST(width_bucket(EXTRACT(EPOCH FROM timestamp)::float8, $1::float8, $2::float8, $3::int), 1), $3::int) AS bucket
+        FROM sensor_readings
+        WHERE timestamp >= to_timestamp($1)
+          AND ($4::text[] IS NULL OR factory_id = ANY($4::text[]))
+    ),
+    ranked AS (
+        SELECT *,
+               ROW_NUMBER() OVER (PARTITION BY factory_id, bucket ORDER BY pm2_5 ASC, timestamp) AS rn_min,
+               ROW_NUMBER() OVER (PARTITION BY factory_id, bucket ORDER BY pm2_5 DESC, timestamp) AS rn_max,
+               COUNT(*) OVER (PARTITION BY factory_id) AS total
+        FROM bucketed
+    )
+    SELECT factory_id, EXTRACT(EPOCH FROM timestamp)::float8 AS ts,
+           pm2_5::float8, COALESCE(so2, 0)::float8, COALESCE(nox, 0)::float8, total
+    FROM ranked
+    WHERE rn_min = 1 OR rn_max = 1
+    ORDER BY factory_id, timestamp ASC
+"""
+
+LTTB_PREREDUCE_FACTOR = 4  # LTTB picks `points` rows from ~this many times as many min/max rows
+
+LATEST_HISTORY_QUERY = """
+    WITH ranked_readings AS (
+        SELECT
+            factory_id, pm2_5, so2, nox, timestamp,
+            ROW_NUMBER() OVER(PARTITION BY factory_id ORDER BY timestamp DESC) as rn
+        FROM sensor_readings
+    )
+    SELECT factory_id, EXTRACT(EPOCH FROM timestamp)::float8 AS ts,
+           pm2_5::float8, COALESCE(so2, 0)::float8, COALESCE(nox, 0)::float8
+    FROM ranked_readings
+    WHERE rn <= $1
+    ORDER BY factory_id, timestamp ASC
+"""
+
+
+def rows_to_arrays(rows) -> np.ndarray:
+    """ Converts (factory_id, ts, pm2_5, so2, nox, ...) rows to a HISTORY_DTYPE array. """
+    return np.array([tuple(row)[:5] for row in rows], dtype=HISTORY_DTYPE)
+
+
+def split_by_factory(data: np.ndarray) -> Dict[str, np.ndarray]:
+    """ Splits a factory-ordered HISTORY_DTYPE array into one array per factory. """
+    if len(data) == 0:
+        return {}
+    # Rows are ordered by factory, so each factory is one contiguous run
+    ids = data["factory_id"]
+    starts = np.concatenate([[0], np.flatnonzero(ids[1:] != ids[:-1]) + 1])
+    ends = np.append(starts[1:], len(data))
+    return {ids[s]: data[s:e] for s, e in zip(starts, ends)}
+
+
+async def fetch_downsampled_history(conn: asyncpg.Connection, since: float, points: int,
+                                    method: str = "lttb", factory_ids: Optional[List[str]] = None
+                                    ) -> Tuple[Dict[str, np.ndarray], Dict[str, int]]:
+    """
+    Readings newer than `since` (epoch seconds), reduced to about `points`
+    rows per factory. The database first buckets the range by time and
+    keeps each bucket's min and max (BUCKETED_HISTORY_QUERY), so memory and
+    transfer are O(points) per factory instead of O(readings); 'lttb' then
+    picks `points` rows from LTTB_PREREDUCE_FACTOR times as many buckets.
+
+    Returns:
+        (HISTORY_DTYPE array per factory, total readings per factory in range)
+    """
+    buckets = max(1, points // 2)
+    if method == "lttb":
+        buckets *= LTTB_PREREDUCE_FACTOR
+    rows = await conn.fetch(BUCKETED_HISTORY_QUERY, since, time.time(), buckets, factory_ids)
+    totals = {row[0]: row[5] for row in rows}
+    histories = {
+        factory_id: downsample_history(readings, points, method)
+        for factory_id, readings in split_by_factory(rows_to_arrays(rows)).items()
+    }
+    return histories, totals
+
+
+async def fetch_latest_history_arrays(conn: asyncpg.Connection, limit: int) -> Dict[str, np.ndarray]:
+    """ The last `limit` readings of every factory, as HISTORY_DTYPE arrays. """
+    return split_by_factory(rows_to_arrays(await conn.fetch(LATEST_HISTORY_QUERY, limit)))
+
+
+def downsample_history(readings: np.ndarray, points: int, method: str = "lttb") -> np.ndarray:
+    """
+    Reduces a factory's readings to about `points` rows, choosing them on
+    the PM2.5 series; SO2 and NOx are taken at the same timestamps.
+    """
+    keep = downsample_indices(readings["timestamp"], readings["pm2_5"], points, method)
+    return readings[keep]
+
+
+def history_to_columns(readings: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Columnar form of readings: one array per field, with timestamps as
+    integer epoch milliseconds. Much smaller than a list of dicts, since
+    field names and ISO strings aren't repeated per reading.
+    """
+    return {
+        "timestamp": np.round(readings["timestamp"] * 1000).astype(np.int64),
+        "pm2_5": np.ascontiguousarray(readings["pm2_5"]),
+        "so2": np.ascontiguousarray(readings["so2"]),
+        "nox": np.ascontiguousarray(readings["nox"]),
+    }
+
+
+def history_to_dicts(readings: np.ndarray) -> List[dict]:
+    """ Formats readings like the dashboard's sensor_history entries. """
+    utc = datetime.timezone.utc
+    return [
+        {
+            "pm2_5": pm2_5,
+            "so2": so2,
+            "nox": nox,
+            "timestamp": datetime.datetime.fromtimestamp(ts, utc).isoformat()
+        }
+        for ts, pm2_5, so2, nox in zip(
+            readings["timestamp"].tolist(), readings["pm2_5"].tolist(),
+            readings["so2"].tolist(), readings["nox"].tolist()
+        )
+    ]
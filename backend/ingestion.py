@@ -0,0 +1,386 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import asyncpg
+import numpy as np
+
+# Optional faster JSON parser for NDJSON bodies; falls back to json.loads
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# --- Wire formats ---
+# NDJSON: one JSON object per line, e.g.
+#   {"factory_id": "factory-001", "pm2_5": 91.2, "so2": 30.1, "nox": 45.6, "timestamp": 1718000000.5}
+# "timestamp" is optional (epoch seconds or ISO-8601); it defaults to the time of receipt.
+#
+# Binary (application/octet-stream), little-endian:
+#   4 bytes   magic b"PSR1"
+#   uint16    number of factory ids (F)
+#   F times:  uint8 length + UTF-8 factory id
+#   uint32    number of readings (N)
+#   N times:  RECORD_DTYPE (uint16 factory index, float64 epoch seconds, 3 x float32)
+BINARY_MAGIC = b"PSR1"
+RECORD_DTYPE = np.dtype([
+    ("factory", "<u2"),
+    ("timestamp", "<f8"),
+    ("pm2_5", "<f4"),
+    ("so2", "<f4"),
+    ("nox", "<f4"),
+])
+
+INSERT_BATCH_SQL = """
+    INSERT INTO sensor_readings (factory_id, pm2_5, so2, nox, timestamp)
+    SELECT f, p, s, n, to_timestamp(t)
+    FROM unnest($1::text[], $2::float8[], $3::float8[], $4::float8[], $5::float8[])
+        AS u(f, p, s, n, t)
+"""
+
+
+class ReadingBatch:
+    """
+    A columnar batch of sensor readings: one array per field, so it can
+    be validated, written and windowed without per-reading Python objects.
+    """
+    def __init__(self, factory_ids, pm2_5, so2, nox, timestamps):
+        self.factory_ids = np.asarray(factory_ids, dtype=object)
+        self.pm2_5 = np.asarray(pm2_5, dtype=np.float64)
+        self.so2 = np.asarray(so2, dtype=np.float64)
+        self.nox = np.asarray(nox, dtype=np.float64)
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.pm2_5)
+
+    @staticmethod
+    def concat(batches: List["ReadingBatch"]) -> "ReadingBatch":
+        return ReadingBatch(
+            np.concatenate([b.factory_ids for b in batches]),
+            np.concatenate([b.pm2_5 for b in batches]),
+            np.concatenate([b.so2 for b in batches]),
+            np.concatenate([b.nox for b in batches]),
+            np.concatenate([b.timestamps for b in batches]),
+        )
+
+    def validate(self) -> "ReadingBatch":
+        """
+        Rejects NaN/Infinity: they would be stored and fed into forecast
+        windows, where every threshold comparison is False.
+        Raises ValueError naming the first offending reading.
+        """
+        for name in ("pm2_5", "so2", "nox", "timestamps"):
+            bad = np.flatnonzero(~np.isfinite(getattr(self, name)))
+            if len(bad):
+                raise ValueError(f"Non-finite {name} in reading {int(bad[0]) + 1}")
+        return self
+
+    def select(self, mask) -> "ReadingBatch":
+        return ReadingBatch(
+            self.factory_ids[mask], self.pm2_5[mask], self.so2[mask],
+            self.nox[mask], self.timestamps[mask]
+        )
+
+
+def _parse_number(value, name: str, default: Optional[float] = None) -> float:
+    if value is None and default is not None:
+        return default
+    # bool is an int subclass, so float(True) would quietly be 1.0
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f"{name} must be a number, got {json.dumps(value)}")
+    return float(value)
+
+
+def _parse_timestamp(value, default: float) -> float:
+    if value is None:
+        return default
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        raise TypeError(f"timestamp must be epoch seconds or an ISO-8601 string, got {json.dumps(value)}")
+    # ISO-8601 string; numpy handles the common 'YYYY-MM-DDTHH:MM:SS[.fff]' forms
+    return np.datetime64(str(value).rstrip("Z"), "ms").astype(np.int64) / 1000.0
+
+
+def parse_ndjson(body: bytes) -> ReadingBatch:
+    """
+    Parses an NDJSON payload into a ReadingBatch.
+    Raises ValueError on malformed lines, missing required fields or
+    non-numeric / non-finite values.
+    """
+    now = time.time()
+    factory_ids, pm2_5, so2, nox, timestamps = [], [], [], [], []
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = _json_loads(line)
+            factory_ids.append(str(item["factory_id"]))
+            pm2_5.append(_parse_number(item["pm2_5"], "pm2_5"))
+            so2.append(_parse_number(item.get("so2"), "so2", 0.0))
+            nox.append(_parse_number(item.get("nox"), "nox", 0.0))
+            timestamps.append(_parse_timestamp(item.get("timestamp"), now))
+            if not all(map(math.isfinite, (pm2_5[-1], so2[-1], nox[-1], timestamps[-1]))):
+                raise ValueError("values must be finite (NaN/Infinity are not allowed)")
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid reading on line {line_no}: {e}")
+    return ReadingBatch(factory_ids, pm2_5, so2, nox, timestamps)
+
+
+def parse_binary(body: bytes) -> ReadingBatch:
+    """
+    Parses the compact binary payload described above into a ReadingBatch.
+    Raises ValueError if the payload is truncated or malformed, or holds
+    NaN/Infinity values.
+    """
+    view = memoryview(body)
+    if bytes(view[:4]) != BINARY_MAGIC:
+        raise ValueError("Bad magic; expected PSR1 binary payload")
+    try:
+        offset = 4
+        n_factories = int.from_bytes(view[offset:offset + 2], "little")
+        offset += 2
+        factory_table = []
+        for _ in range(n_factories):
+            length = view[offset]
+            offset += 1
+            factory_table.append(bytes(view[offset:offset + length]).decode("utf-8"))
+            offset += length
+        n_readings = int.from_bytes(view[offset:offset + 4], "little")
+        offset += 4
+        records = np.frombuffer(body, dtype=RECORD_DTYPE, count=n_readings, offset=offset)
+    except (IndexError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed binary payload: {e}")
+
+    if offset + records.nbytes != len(body):
+        raise ValueError(f"Malformed binary payload: {len(body) - offset - records.nbytes} trailing bytes")
+    if n_readings and records["factory"].max() >= n_factories:
+        raise ValueError("Reading references an unknown factory index")
+
+    factory_ids = np.asarray(factory_table, dtype=object)[records["factory"]]
+    return ReadingBatch(
+        factory_ids, records["pm2_5"], records["so2"], records["nox"], records["timestamp"]
+    ).validate()
+
+
+class RecentReadings:
+    """
+    Per-factory rolling window of the latest PM2.5 readings, shared by the
+    ingestion consumer and the monitor so forecasting doesn't have to
+    re-read history from the database.
+    """
+    def __init__(self, window: int = 20):
+        self.window = window
+        self._history: Dict[str, deque] = {}
+        self._latest: Dict[str, dict] = {}
+        self._counts: Dict[str, int] = {}
+        self._peaks: Dict[str, dict] = {}
+        self._updated: set = set()
+
+    def set_window(self, window: int):
+        if window == self.window:
+            return
+        self.window = window
+        self._history = {fid: deque(h, maxlen=window) for fid, h in self._history.items()}
+
+    def add(self, factory_id: str, reading: dict):
+        history = self._history.get(factory_id)
+        if history is None:
+            history = self._history[factory_id] = deque(maxlen=self.window)
+        history.append(float(reading["pm2_5"]))
+        self._latest[factory_id] = reading
+        self._counts[factory_id] = self._counts.get(factory_id, 0) + 1
+        peak = self._peaks.get(factory_id)
+        if peak is None or reading["pm2_5"] > peak["pm2_5"]:
+            self._peaks[factory_id] = reading
+        self._updated.add(factory_id)
+
+    def add_batch(self, batch: ReadingBatch):
+        """
+        Same result as add() for every reading in timestamp order, but
+        grouped by factory with NumPy: the Python loop is per factory,
+        not per reading.
+        """
+        if len(batch) == 0:
+            return
+        # Factory codes via a dict: much faster than np.unique on object arrays
+        codes: Dict[str, int] = {}
+        inverse = np.fromiter(
+            (codes.setdefault(fid, len(codes)) for fid in batch.factory_ids.tolist()),
+            dtype=np.int64, count=len(batch)
+        )
+        factories = list(codes)
+        # Chronological within each factory, even if the batch is interleaved
+        order = np.lexsort((batch.timestamps, inverse))
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(inverse[order])) + 1])
+        ends = np.append(starts[1:], len(order))
+        # Each factory's highest reading (earliest on ties, like add())
+        by_peak = np.lexsort((batch.timestamps, -batch.pm2_5, inverse))
+        tops = by_peak[starts].tolist()
+        lasts = order[ends - 1].tolist()
+
+        pm2_5, so2, nox = batch.pm2_5.tolist(), batch.so2.tolist(), batch.nox.tolist()
+        timestamps = batch.timestamps.tolist()
+        ordered_pm2_5 = batch.pm2_5[order].tolist()
+        window = self.window
+
+        def reading(i):
+            return {"pm2_5": pm2_5[i], "so2": so2[i], "nox": nox[i], "timestamp": timestamps[i]}
+
+        for factory_id, lo, hi, last, top in zip(factories, starts.tolist(), ends.tolist(), lasts, tops):
+            history = self._history.get(factory_id)
+            if history is None:
+                history = self._history[factory_id] = deque(maxlen=window)
+            history.extend(ordered_pm2_5[max(lo, hi - window):hi])
+            self._latest[factory_id] = reading(last)
+            self._counts[factory_id] = self._counts.get(factory_id, 0) + hi - lo
+            peak = self._peaks.get(factory_id)
+            if peak is None or pm2_5[top] > peak["pm2_5"]:
+                self._peaks[factory_id] = reading(top)
+        self._updated.update(factories)
+
+    def history(self, factory_id: str) -> List[float]:
+        return list(self._history.get(factory_id, ()))
+
+    def seed(self, factory_id: str, values: List[float]):
+        """ Replaces a factory's window, e.g. with history loaded from the DB. """
+        self._history[factory_id] = deque(values, maxlen=self.window)
+
+    def count(self, factory_id: str) -> int:
+        """ Total readings seen for a factory since startup (a sequence number). """
+        return self._counts.get(factory_id, 0)
+
+    def latest(self, factory_id: str) -> Optional[dict]:
+        return self._latest.get(factory_id)
+
+    def peak(self, factory_id: str) -> Optional[dict]:
+        """ The highest-PM2.5 reading since the factory's last pop_peak(), if any. """
+        return self._peaks.get(factory_id)
+
+    def pop_peak(self, factory_id: str) -> Optional[dict]:
+        """
+        Returns and resets the highest-PM2.5 reading since the last call, so
+        a check sees every breach in between, not just the latest reading.
+        None if no readings arrived since then.
+        """
+        return self._peaks.pop(factory_id, None)
+
+    def pop_updated(self) -> set:
+        """ Returns the factories that received readings since the last call. """
+        updated, self._updated = self._updated, set()
+        return updated
+
+
+class IngestQueue:
+    """
+    Bounded queue of ReadingBatches. The bound is in *readings*, not
+    batches, so one huge batch can't sneak past it. offer() never blocks:
+    it returns False when the queue is full so the API can answer 429.
+    """
+    def __init__(self, max_readings: int = 200_000):
+        self.max_readings = max_readings
+        self.pending = 0
+        self.accepted_total = 0
+        self.rejected_total = 0
+        self._batches: deque = deque()
+        self._ready = asyncio.Event()
+
+    def offer(self, batch: ReadingBatch) -> bool:
+        if self.pending + len(batch) > self.max_readings:
+            self.rejected_total += len(batch)
+            return False
+        self._batches.append(batch)
+        self.pending += len(batch)
+        self.accepted_total += len(batch)
+        self._ready.set()
+        return True
+
+    def requeue(self, batch: ReadingBatch):
+        """ Puts an already-accepted batch back at the head, e.g. after a failed write. """
+        self._batches.appendleft(batch)
+        self.pending += len(batch)
+        self._ready.set()
+
+    async def take(self, max_readings: int) -> ReadingBatch:
+        """ Waits for data, then returns up to ~max_readings queued readings as one batch. """
+        while not self._batches:
+            self._ready.clear()
+            await self._ready.wait()
+        taken, count = [], 0
+        while self._batches and (not taken or count + len(self._batches[0]) <= max_readings):
+            batch = self._batches.popleft()
+            taken.append(batch)
+            count += len(batch)
+        self.pending -= count
+        return taken[0] if len(taken) == 1 else ReadingBatch.concat(taken)
+
+    def retry_after_seconds(self, drain_rate: float) -> int:
+        """ Rough hint for the Retry-After header, based on the consumer's drain rate. """
+        if drain_rate <= 0:
+            return 1
+        return max(1, int(self.pending / drain_rate))
+
+
+async def write_batch(conn: asyncpg.Connection, batch: ReadingBatch):
+    """ Writes a whole batch in a single round trip using array parameters. """
+    await conn.execute(
+        INSERT_BATCH_SQL,
+        batch.factory_ids.tolist(), batch.pm2_5.tolist(), batch.so2.tolist(),
+        batch.nox.tolist(), batch.timestamps.tolist()
+    )
+
+
+async def ingest_consumer(pool: asyncpg.Pool, queue: IngestQueue, recent: RecentReadings,
+                          stats: dict, max_batch: int = 20_000, max_attempts: int = 8,
+                          retry_backoff: float = 0.5, max_backoff: float = 30.0):
+    """
+    Background task: drains the ingest queue, bulk-writes readings to
+    `sensor_readings` and feeds the monitor's rolling windows.
+
+    Accepted readings have already been answered with 202, so a failed
+    write puts the batch back at the head of the queue and retries with
+    exponential backoff (the queue keeps counting it, so producers get
+    429s meanwhile). It is dropped only after `max_attempts` consecutive
+    failures.
+    """
+    print("Starting ingestion consumer...")
+    failures = 0
+    while True:
+        batch = await queue.take(max_batch)
+        started = time.perf_counter()
+        try:
+            async with pool.acquire() as conn:
+                try:
+                    await write_batch(conn, batch)
+                except asyncpg.exceptions.ForeignKeyViolationError:
+                    # Drop readings for factories that aren't registered, keep the rest
+                    known = {r["id"] for r in await conn.fetch("SELECT id FROM factories")}
+                    mask = np.array([fid in known for fid in batch.factory_ids], dtype=bool)
+                    print(f"Ingestion: dropping {int((~mask).sum())} readings for unknown factories")
+                    batch = batch.select(mask)
+                    if len(batch):
+                        await write_batch(conn, batch)
+        except Exception as e:
+            failures += 1
+            stats["write_errors"] = stats.get("write_errors", 0) + 1
+            if failures >= max_attempts:
+                print(f"Error in ingestion consumer, dropping {len(batch)} readings after {failures} attempts: {e}")
+                stats["failed_total"] = stats.get("failed_total", 0) + len(batch)
+                failures = 0
+            else:
+                print(f"Error in ingestion consumer (attempt {failures}/{max_attempts}), will retry: {e}")
+                queue.requeue(batch)
+                await asyncio.sleep(min(retry_backoff * 2 ** (failures - 1), max_backoff))
+            continue
+
+        failures = 0
+        recent.add_batch(batch)
+        elapsed = time.perf_counter() - started
+        stats["written_total"] = stats.get("written_total", 0) + len(batch)
+        if elapsed > 0:
+            stats["drain_rate"] = len(batch) / elapsed
@@ -64,4 +64,52 @@ class SensorSimulator:
             "so2": max(0, so2),
             "nox": max(0, nox),
             "timestamp": np.datetime_as_string(np.datetime64('now', 's'))
-        }
\ No newline at end of file
+        }
+
+def simulate_fleet(n_steps: int, base_levels, max_level=180.0, spike_chance=0.05, seed=None) -> np.ndarray:
+    """
+    Vectorized SensorSimulator for a whole fleet: the same drift and spike
+    rules, stepped for every factory at once with NumPy.
+    
+    Args:
+        n_steps: Readings to generate per factory.
+        base_levels: One base PM2.5 level per factory.
+        max_level, spike_chance: Scalars or one value per factory.
+        seed: Optional seed for reproducible replays.
+        
+    Returns:
+        PM2.5 readings of shape (n_factories, n_steps).
+    """
+    rng = np.random.default_rng(seed)
+    base = np.asarray(base_levels, dtype=np.float64)
+    n = len(base)
+    max_level = np.broadcast_to(np.asarray(max_level, dtype=np.float64), (n,))
+    spike_chance = np.broadcast_to(np.asarray(spike_chance, dtype=np.float64), (n,))
+
+    current = base.copy()
+    in_spike = np.zeros(n, dtype=bool)
+    spike_duration = np.zeros(n, dtype=np.int64)
+    readings = np.empty((n, n_steps))
+
+    for t in range(n_steps):
+        normal = ~in_spike
+
+        # Normal, gentle drift (kept within +/- 20 of base)
+        drift = rng.uniform(-2.5, 2.5, n) + np.sin(rng.random(n) * np.pi)
+        current = np.where(normal, np.clip(current + drift, base - 20, base + 20), current)
+
+        # Spike: rapid increase, then cool down to base
+        current = np.where(in_spike, current + rng.uniform(5, 15, n), current)
+        spike_duration -= in_spike
+        ended = in_spike & ((spike_duration <= 0) | (current > max_level))
+        current = np.where(ended, base, np.minimum(current, max_level))
+        in_spike &= ~ended
+        current = np.round(current, 2)
+
+        # Check if a new spike should start
+        start = normal & (rng.random(n) < spike_chance)
+        in_spike |= start
+        spike_duration = np.where(start, rng.integers(5, 11, n), spike_duration)
+
+        readings[:, t] = np.maximum(0, current)
+    return readings
@@ -1,17 +1,32 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import asyncio
 import asyncpg
 import datetime
 import os
+import random
+import time
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
 # Import our custom modules
 from iot_simulator import SensorSimulator
 from ai_forecaster import LSTMForecaster
+from downsample import DOWNSAMPLE_METHODS
+from encoding import encode_response
+from history import (
+    fetch_downsampled_history, fetch_latest_history_arrays, history_to_columns, history_to_dicts
+)
+from forecast_cache import LatestForecasts, TrajectoryCache
+from ingestion import (
+    IngestQueue, ReadingBatch, RecentReadings, ingest_consumer, parse_binary, parse_ndjson, write_batch
+)
+from events import EventBus, ForecastAlert, SlashTriggered, StatusChanged
+from scheduler import MonitorScheduler
+from tiered_forecaster import TieredForecaster
 
 # --- 1. Configuration ---
 load_dotenv()  # Load .env file
@@ -21,9 +36,24 @@ if not DATABASE_URL:
 
 FORECAST_ALERT_THRESHOLD = 150.0  # "Warning" level
 ACTUAL_PENALTY_THRESHOLD = 200.0  # "Lenient" penalty level
-MONITORING_INTERVAL_SECONDS = 3   # How often to check (in seconds)
+MONITORING_INTERVAL_SECONDS = 3   # Simulated sensor cadence; also spreads the first check of new factories (in seconds)
+MONITOR_MIN_INTERVAL_SECONDS = 1.0   # Cadence for ALERT/PENALTY factories
+MONITOR_MAX_INTERVAL_SECONDS = 30.0  # Cadence for calm factories far below the threshold
+MONITOR_MAX_CHECKS_PER_SECOND = 200.0  # Global rate cap across the fleet
+MONITOR_JITTER = 0.1              # +/- fraction applied to every interval
 SLASH_AMOUNT = 10.0               # Amount to slash per breach
 MAX_HISTORY_LENGTH = 50           # How many readings to send to frontend
+MAX_HISTORY_POINTS = 5000         # Upper bound on downsampled points per factory
+MAX_HISTORY_HOURS = 24 * 31       # Longest history range served for one factory
+MAX_FLEET_HISTORY_HOURS = 24 * 7  # Longest history range served for every factory at once (dashboard)
+HISTORY_FORMATS = ("rows", "columnar")
+PREFILTER_MARGIN = 40.0           # Run the LSTM only if the cheap forecast is within this of the alert threshold
+PREFILTER_AUDIT_RATE = 0.05       # Fraction of pre-filtered factories also checked by the LSTM (recall estimate)
+FORECAST_TOLERANCE = 8.0          # Max PM2.5 drift from a cached trajectory before re-inferring
+INGEST_QUEUE_MAX_READINGS = 200_000  # Backpressure bound for /api/readings/batch
+INGEST_MAX_BATCH_READINGS = 50_000   # Max readings accepted in a single request
+INGEST_MAX_BODY_BYTES = 8 * 1024 * 1024  # Max request body for /api/readings/batch
+INGEST_WRITE_BATCH = 20_000          # Max readings per bulk INSERT
 
 # --- 2. App & Middleware Setup ---
 app = FastAPI()
@@ -73,43 +103,114 @@ simulators = {
     "factory-002": SensorSimulator(base_level=60, spike_chance=0.02, max_level=220),
 }
 
+# The model is loaded in the background by startup_event (see load_model_task),
+# so importing this module doesn't import TensorFlow or read the .keras file.
 forecaster = LSTMForecaster(
     model_path="lstm_model.keras",
     scaler_path="scaler.joblib",
-    breach_threshold=FORECAST_ALERT_THRESHOLD
+    breach_threshold=FORECAST_ALERT_THRESHOLD,
+    load=False
+)
+
+# Rolling per-factory PM2.5 windows (simulated + ingested) and the ingest queue
+recent_readings = RecentReadings(window=forecaster.look_back)
+ingest_queue = IngestQueue(max_readings=INGEST_QUEUE_MAX_READINGS)
+ingest_stats: Dict[str, Any] = {}
+
+# Latest multi-step forecast per factory, reused across ticks while readings track it
+forecast_cache = TrajectoryCache(tolerance=FORECAST_TOLERANCE, lead_index=forecaster.lead_index())
+# Latest logged forecast per factory, served by the forecast endpoints without a query
+latest_forecasts = LatestForecasts()
+# Cheap statistical pre-filter in front of the (batched) LSTM
+tiered_forecaster = TieredForecaster(
+    forecaster, forecast_cache,
+    threshold=FORECAST_ALERT_THRESHOLD,
+    margin=PREFILTER_MARGIN,
+    audit_rate=PREFILTER_AUDIT_RATE
 )
 
-# --- 4. Database Connection Pool ---
+# Per-factory, risk-adaptive check cadence for the monitor
+monitor_scheduler = MonitorScheduler(
+    threshold=FORECAST_ALERT_THRESHOLD,
+    min_interval=MONITOR_MIN_INTERVAL_SECONDS,
+    max_interval=MONITOR_MAX_INTERVAL_SECONDS,
+    max_checks_per_second=MONITOR_MAX_CHECKS_PER_SECOND,
+    jitter=MONITOR_JITTER
+)
+
+# --- 4. Database Connection Pool & Startup ---
 app.state.pool = None
+# Readiness of each startup component: "pending", "ready" or "failed" (terminal)
+app.state.startup_status = {"model": "pending", "database": "pending"}
+# Why a component failed, reported by /readyz and /api/predict-aqi
+app.state.startup_errors = {}
 
-@app.on_event("startup")
-async def startup_event():
+async def load_model_task():
+    """
+    Loads the LSTM and runs a warm-up inference in a worker thread so the
+    event loop keeps serving requests while TensorFlow initializes.
     """
-    On server startup:
-    1. Create the database connection pool.
-    2. Ensure mock data (factories, state) exists.
-    3. Launch the autonomous monitoring background task.
+    try:
+        loaded = await asyncio.to_thread(forecaster.load)
+        if loaded:
+            await asyncio.to_thread(forecaster.warm_up)
+            recent_readings.set_window(forecaster.look_back)
+            forecast_cache.lead_index = forecaster.lead_index()
+        if not loaded:
+            app.state.startup_errors["model"] = forecaster.load_error
+        app.state.startup_status["model"] = "ready" if loaded else "failed"
+    except Exception as e:
+        print(f"CRITICAL: Failed to load or warm up model. {e}")
+        app.state.startup_errors["model"] = f"Warm-up failed: {e}"
+        app.state.startup_status["model"] = "failed"
+    finally:
+        app.state.model_loaded.set()
+
+async def check_event_schema(pool: asyncpg.Pool) -> List[str]:
+    """
+    Verifies the schema from EVENT_OUTBOX_SCHEMA.sql: the event_outbox
+    table, and a unique index on slash_events.tx_hash (apply_penalty's
+    ON CONFLICT needs it). Returns a list of problems, empty if all is well.
+    """
+    problems = []
+    if await pool.fetchval("SELECT to_regclass('event_outbox')") is None:
+        problems.append("Table event_outbox not found")
+    unique_tx_hash = await pool.fetchval(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = to_regclass('slash_events')
+              AND i.indisunique AND i.indnatts = 1 AND i.indpred IS NULL
+              AND a.attname = 'tx_hash'
+        )
+        """
+    )
+    if not unique_tx_hash:
+        problems.append("No unique index on slash_events (tx_hash)")
+    return problems
+
+async def init_database_task():
+    """
+    Creates the connection pool, runs the seed inserts concurrently on
+    separate connections and then starts the DB-backed background tasks.
     """
     try:
         print("Connecting to database...")
         app.state.pool = await asyncpg.create_pool(
             DATABASE_URL,
-            min_size=1,
+            min_size=2,
             max_size=10
         )
+        print("Database connection pool created successfully.")
         
-        # --- MOVED INITIALIZATION LOGIC HERE ---
         print("Ensuring initial data exists in database...")
-        async with app.state.pool.acquire() as conn:
-            # Use INSERT ... ON CONFLICT to safely initialize.
-            
-            print("Ensuring protocol state exists (ID: 1)...")
-            await conn.execute(
+        # Use INSERT ... ON CONFLICT to safely initialize.
+        await asyncio.gather(
+            app.state.pool.execute(
                 "INSERT INTO protocol_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING"
-            )
-
-            print("Ensuring mock factories exist...")
-            await conn.execute(
+            ),
+            app.state.pool.execute(
                 """
                 INSERT INTO factories (id, name, stake_balance, status) VALUES
                 ('factory-001', 'Bhilai Steel Plant', 100.0, 'NORMAL'),
@@ -118,130 +219,315 @@ async def startup_event():
                 """
                 # ON CONFLICT (id) DO NOTHING ensures that if 'factory-001'
                 # already exists, this command just skips it without erroring.
-            )
+            ),
+        )
         print("Database initialization check complete.")
-        # --- END MOVED LOGIC ---
-        
-        print("Database connection pool created successfully.")
+
+        # Prime the latest-forecast map from forecast_logs (one query, at startup only)
+        forecast_rows = await app.state.pool.fetch(
+            """
+            SELECT DISTINCT ON (factory_id) factory_id, predicted_value, breach_predicted, timestamp
+            FROM forecast_logs
+            ORDER BY factory_id, timestamp DESC
+            """
+        )
+        for row in forecast_rows:
+            latest_forecasts.update(
+                row['factory_id'], row['predicted_value'], row['breach_predicted'], row['timestamp']
+            )
+
+        # Slashes and status changes go through the event outbox; without its
+        # schema they would never be applied, so refuse to start the monitor
+        schema_problems = await check_event_schema(app.state.pool)
+        if schema_problems:
+            reason = "; ".join(schema_problems) + ". Run backend/EVENT_OUTBOX_SCHEMA.sql and restart."
+            print(f"CRITICAL: {reason}")
+            app.state.startup_errors["database"] = reason
+            app.state.startup_status["database"] = "failed"
+            return
+        app.state.startup_status["database"] = "ready"
         
-        # Start the background task, passing the pool
+        # Start the background tasks, passing the pool
+        await event_bus.start(app.state.pool)
+        asyncio.create_task(simulate_sensors(app.state.pool))
         asyncio.create_task(autonomous_monitor(app.state.pool))
+        asyncio.create_task(ingest_consumer(
+            app.state.pool, ingest_queue, recent_readings, ingest_stats, INGEST_WRITE_BATCH
+        ))
         
-    except asyncpg.exceptions.UndefinedTableError:
+    except asyncpg.exceptions.UndefinedTableError as e:
+         app.state.startup_errors["database"] = f"Tables not found: {e}"
+         app.state.startup_status["database"] = "failed"
          print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
          print("CRITICAL ERROR: Tables not found.")
          print("You must run the 8-table schema SQL in your NeonDB editor first.")
          print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
     except Exception as e:
+        app.state.startup_errors["database"] = str(e)
+        app.state.startup_status["database"] = "failed"
         print(f"CRITICAL: Failed to connect or initialize database. {e}")
 
+@app.on_event("startup")
+async def startup_event():
+    """
+    On server startup, kick off in the background and return immediately:
+    1. Loading + warming up the LSTM model (in a worker thread).
+    2. Creating the DB pool and seeding initial data, concurrently with 1.
+    The monitor starts once the DB is up and waits for the model load to
+    finish. /healthz answers right away; /readyz reports when both are ready.
+    """
+    app.state.model_loaded = asyncio.Event()
+    app.state.startup_tasks = [
+        asyncio.create_task(load_model_task()),
+        asyncio.create_task(init_database_task()),
+    ]
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """
-    On server shutdown, close the database connection pool.
+    On server shutdown, flush pending events to the outbox and close the
+    database connection pool.
     """
     if app.state.pool:
+        await event_bus.stop()
         print("Closing database connection pool.")
         await app.state.pool.close()
 
+# --- 4.5 Event Bus & Consumers ---
+# The monitor publishes events and moves on; side effects (slashing, status
+# writes, alert logging) run in these consumers, persisted via event_outbox
+# (see EVENT_OUTBOX_SCHEMA.sql) and retried on failure.
+event_bus = EventBus()
+# Last status the monitor decided per factory; StatusChanged is published on change
+factory_status: Dict[str, str] = {}
+# created_at of the newest StatusChanged applied per factory, so a retried
+# older event can't overwrite a newer status
+status_applied_at: Dict[str, float] = {}
+
+async def apply_penalty(conn: asyncpg.Connection, factory_id: str, current_pm2_5: float,
+                        amount: float, tx_hash: str):
+    """
+    TIER 2: slashes a factory that is breaching the penalty threshold NOW.
+    Idempotent per tx_hash (unique, see EVENT_OUTBOX_SCHEMA.sql), so a
+    redelivered event can't slash twice.
+    """
+    # Use a transaction for the slash
+    async with conn.transaction():
+        # Get current stake
+        factory_row = await conn.fetchrow("SELECT stake_balance FROM factories WHERE id = $1 FOR UPDATE", factory_id)
+        current_stake = factory_row['stake_balance'] if factory_row else 0
+        
+        # Perform the "Slash"
+        actual_slash = min(current_stake, amount)
+        new_stake = current_stake - actual_slash
+        
+        # Log the slash event (critical step); a conflict means an earlier
+        # delivery of this event already applied it
+        inserted = await conn.fetchval(
+            """
+            INSERT INTO slash_events (factory_id, amount, reason, triggered_by, tx_hash)
+            VALUES ($1, $2, $3, 'ORACLE', $4)
+            ON CONFLICT (tx_hash) DO NOTHING
+            RETURNING tx_hash
+            """,
+            factory_id, actual_slash, f"Actual PM2.5 breach: {current_pm2_5}", tx_hash
+        )
+        if inserted is None:
+            return
+        print(f"!!! PENALTY: {factory_id} is breaching NOW ({current_pm2_5})")
+        
+        await conn.execute("UPDATE factories SET stake_balance = $1 WHERE id = $2", new_stake, factory_id)
+        await conn.execute("UPDATE protocol_state SET admin_fund_balance = admin_fund_balance + $1 WHERE id = 1", actual_slash)
+
+async def handle_slash(event: SlashTriggered):
+    async with app.state.pool.acquire() as conn:
+        await apply_penalty(conn, event.factory_id, event.pm2_5, event.amount, f"mock_tx_{event.event_id}")
+
+async def handle_status_change(event: StatusChanged):
+    if event.created_at < status_applied_at.get(event.factory_id, 0.0):
+        return
+    await app.state.pool.execute(
+        "UPDATE factories SET status = $2 WHERE id = $1", event.factory_id, event.new_status
+    )
+    status_applied_at[event.factory_id] = event.created_at
+
+async def log_forecast_alert(event: ForecastAlert):
+    print(f"!!! ALERT: {event.factory_id} predicted to breach ({event.predicted_value})")
+
+# An on-chain consumer (e.g. calling EcoStake.slash on a Hardhat node) can
+# subscribe to SlashTriggered the same way without slowing the monitor.
+event_bus.subscribe(SlashTriggered, handle_slash)
+event_bus.subscribe(StatusChanged, handle_status_change)
+event_bus.subscribe(ForecastAlert, log_forecast_alert)
+
 # --- 5. Background Monitoring Task ---
+async def get_pm2_5_history(conn: asyncpg.Connection, factory_id: str) -> List[float]:
+    """
+    Returns the last `look_back` PM2.5 readings in chronological order.
+    Served from the in-memory window; falls back to the DB (and seeds the
+    window) until enough readings have been seen since startup.
+    """
+    history = recent_readings.history(factory_id)
+    if len(history) >= forecaster.look_back:
+        return history
+
+    history_rows = await conn.fetch(
+        """
+        SELECT pm2_5 FROM sensor_readings
+        WHERE factory_id = $1
+        ORDER BY timestamp DESC
+        LIMIT $2
+        """,
+        factory_id, forecaster.look_back
+    )
+    history = [row['pm2_5'] for row in history_rows]
+    history.reverse() # Needs to be in chronological order
+    recent_readings.seed(factory_id, history)
+    return history
+
+async def evaluate_factories(conn: asyncpg.Connection, current: Dict[str, float]):
+    """
+    Applies the penalty and forecast tiers to each factory's current reading
+    (the highest one since its last check).
+    Forecasts for all non-penalized factories are made in one tiered,
+    batched call and logged with executemany. Slashes, alerts and status
+    changes are published to the event bus rather than applied inline;
+    factory_status holds the resulting status of every evaluated factory.
+    """
+    histories: Dict[str, List[float]] = {}
+    seqs: Dict[str, int] = {}
+    statuses: Dict[str, str] = {}
+
+    for factory_id, current_pm2_5 in current.items():
+        # TIER 2: PENALTY CHECK (Actual Breach)
+        if current_pm2_5 > ACTUAL_PENALTY_THRESHOLD:
+            event_bus.publish(SlashTriggered(factory_id=factory_id, pm2_5=current_pm2_5, amount=SLASH_AMOUNT))
+            statuses[factory_id] = 'PENALTY'
+            continue
+
+        # TIER 1: FORECAST CHECK (Predicted Breach)
+        pm2_5_history = await get_pm2_5_history(conn, factory_id)
+        if len(pm2_5_history) < forecaster.look_back:
+            statuses[factory_id] = 'NORMAL'
+        else:
+            histories[factory_id] = pm2_5_history
+            seqs[factory_id] = recent_readings.count(factory_id)
+
+    predictions = tiered_forecaster.forecast(histories, seqs)
+    if predictions:
+        # Log the forecasts
+        await conn.executemany(
+            """
+            INSERT INTO forecast_logs (factory_id, predicted_value, breach_predicted)
+            VALUES ($1, $2, $3)
+            """,
+            [(fid, val, val > FORECAST_ALERT_THRESHOLD) for fid, val in predictions.items()]
+        )
+        logged_at = datetime.datetime.now(datetime.timezone.utc)
+        for fid, val in predictions.items():
+            latest_forecasts.update(
+                fid, val, val > FORECAST_ALERT_THRESHOLD, logged_at, tiered_forecaster.trajectories.get(fid)
+            )
+
+    for factory_id, predicted_val in predictions.items():
+        if predicted_val > FORECAST_ALERT_THRESHOLD:
+            event_bus.publish(ForecastAlert(
+                factory_id=factory_id, predicted_value=predicted_val, threshold=FORECAST_ALERT_THRESHOLD
+            ))
+            statuses[factory_id] = 'ALERT'
+        else:
+            statuses[factory_id] = 'NORMAL'
+
+    for factory_id, status in statuses.items():
+        old_status = factory_status.get(factory_id)
+        if status != old_status:
+            event_bus.publish(StatusChanged(factory_id=factory_id, old_status=old_status, new_status=status))
+            factory_status[factory_id] = status
+
+async def simulate_sensors(pool: asyncpg.Pool):
+    """
+    Samples the simulated sensors every MONITORING_INTERVAL_SECONDS, like
+    real sensors posting to /api/readings/batch. The sampling rate is
+    fixed; monitor_scheduler only decides how often factories are evaluated.
+    """
+    while True:
+        started = time.monotonic()
+        try:
+            # 1. Get new simulated data for all simulated factories
+            new_readings = {
+                factory_id: simulator.get_next_reading()
+                for factory_id, simulator in simulators.items()
+            }
+
+            # 2. Add to history in DB (one round trip for all factories)
+            now = time.time()
+            async with pool.acquire() as conn:
+                await write_batch(conn, ReadingBatch(
+                    list(new_readings),
+                    [r["pm2_5"] for r in new_readings.values()],
+                    [r["so2"] for r in new_readings.values()],
+                    [r["nox"] for r in new_readings.values()],
+                    [now] * len(new_readings)
+                ))
+            for factory_id, new_reading in new_readings.items():
+                recent_readings.add(factory_id, new_reading)
+        except Exception as e:
+            print(f"Error in sensor simulation: {e}")
+        await asyncio.sleep(max(0.0, MONITORING_INTERVAL_SECONDS - (time.monotonic() - started)))
+
 async def autonomous_monitor(pool: asyncpg.Pool):
     """
     This function runs in the background, using the DB pool.
+    Factories are checked when their own deadline in monitor_scheduler
+    comes up, so the work per second follows fleet risk, not fleet size.
     """
     await asyncio.sleep(1) # Give server a moment to start
+    await app.state.model_loaded.wait() # Forecasts need the model (or its failed load) settled
     print("Starting autonomous monitoring cycle...")
     
     while True:
+        due = []
         try:
-            async with pool.acquire() as conn:
-                for factory_id in simulators:
-                    
-                    # 1. Get new simulated data
-                    new_reading = simulators[factory_id].get_next_reading()
-                    current_pm2_5 = new_reading["pm2_5"]
-                    
-                    # 2. Add to history in DB
-                    await conn.execute(
-                        """
-                        INSERT INTO sensor_readings (factory_id, pm2_5, so2, nox)
-                        VALUES ($1, $2, $3, $4)
-                        """,
-                        factory_id, new_reading["pm2_5"], new_reading["so2"], new_reading["nox"]
-                    )
-                    
-                    # 3. Get recent history from DB for AI
-                    history_rows = await conn.fetch(
-                        """
-                        SELECT pm2_5 FROM sensor_readings
-                        WHERE factory_id = $1
-                        ORDER BY timestamp DESC
-                        LIMIT $2
-                        """,
-                        factory_id, forecaster.look_back
-                    )
-                    
-                    pm2_5_history = [row['pm2_5'] for row in history_rows]
-                    pm2_5_history.reverse() # Needs to be in chronological order
-                    
-                    # 4. --- Check Tiers (Penalty > Alert) ---
-                    
-                    # TIER 2: PENALTY CHECK (Actual Breach)
-                    if current_pm2_5 > ACTUAL_PENALTY_THRESHOLD:
-                        print(f"!!! PENALTY: {factory_id} is breaching NOW ({current_pm2_5})")
-                        
-                        # Use a transaction for the slash
-                        async with conn.transaction():
-                            # Set status to PENALTY
-                            await conn.execute("UPDATE factories SET status = 'PENALTY' WHERE id = $1", factory_id)
-                            
-                            # Get current stake
-                            factory_row = await conn.fetchrow("SELECT stake_balance FROM factories WHERE id = $1 FOR UPDATE", factory_id)
-                            current_stake = factory_row['stake_balance'] if factory_row else 0
-                            
-                            # Perform the "Slash"
-                            actual_slash = min(current_stake, SLASH_AMOUNT)
-                            new_stake = current_stake - actual_slash
-                            
-                            await conn.execute("UPDATE factories SET stake_balance = $1 WHERE id = $2", new_stake, factory_id)
-                            await conn.execute("UPDATE protocol_state SET admin_fund_balance = admin_fund_balance + $1 WHERE id = 1", actual_slash)
-                            
-                            # Log the slash event (critical step)
-                            await conn.execute(
-                                """
-                                INSERT INTO slash_events (factory_id, amount, reason, triggered_by, tx_hash)
-                                VALUES ($1, $2, $3, 'ORACLE', $4)
-                                """,
-                                factory_id, actual_slash, f"Actual PM2.5 breach: {current_pm2_5}", f"mock_tx_{asyncio.get_event_loop().time()}"
-                            )
-                    
-                    # TIER 1: FORECAST CHECK (Predicted Breach)
-                    else:
-                        if len(pm2_5_history) < forecaster.look_back:
-                            await conn.execute("UPDATE factories SET status = 'NORMAL' WHERE id = $1", factory_id)
-                        else:
-                            breach_predicted, predicted_val = forecaster.predict_breach(pm2_5_history)
-                            
-                            # Log the forecast
-                            await conn.execute(
-                                """
-                                INSERT INTO forecast_logs (factory_id, predicted_value, breach_predicted)
-                                VALUES ($1, $2, $3)
-                                """,
-                                factory_id, predicted_val, bool(breach_predicted)
-                            )
-                            
-                            if breach_predicted:
-                                print(f"!!! ALERT: {factory_id} predicted to breach ({predicted_val})")
-                                await conn.execute("UPDATE factories SET status = 'ALERT' WHERE id = $1", factory_id)
-                            else:
-                                await conn.execute("UPDATE factories SET status = 'NORMAL' WHERE id = $1", factory_id)
+            # Readings arrive from the simulators and /api/readings/batch:
+            # pick up new factories, and check early on a worrying reading.
+            for factory_id in recent_readings.pop_updated():
+                if factory_id not in monitor_scheduler:
+                    monitor_scheduler.schedule(factory_id, random.uniform(0, MONITORING_INTERVAL_SECONDS))
+                elif recent_readings.peak(factory_id)["pm2_5"] >= FORECAST_ALERT_THRESHOLD - PREFILTER_MARGIN:
+                    monitor_scheduler.expedite(factory_id)
+
+            due = monitor_scheduler.pop_due()
+            if not due:
+                await asyncio.sleep(monitor_scheduler.seconds_until_next())
+                continue
+
+            # 1. The penalty tier judges the highest reading since each
+            # factory's last check, so a breach followed by a lower reading
+            # isn't missed. Factories with no new readings are skipped.
+            current = {}
+            for factory_id in due:
+                peak = recent_readings.pop_peak(factory_id)
+                if peak is not None:
+                    current[factory_id] = peak["pm2_5"]
+
+            # 2. --- Check Tiers (Penalty > Alert) ---
+            if current:
+                async with pool.acquire() as conn:
+                    await evaluate_factories(conn, current)
+
+            # 3. Next check for each factory depends on its new risk
+            for factory_id in due:
+                monitor_scheduler.reschedule(
+                    factory_id, factory_status.get(factory_id, 'NORMAL'), recent_readings.history(factory_id)
+                )
                                 
         except Exception as e:
             print(f"Error in monitoring loop: {e}")
             # Don't crash the loop, just log and wait
-        
-        await asyncio.sleep(MONITORING_INTERVAL_SECONDS)
+            for factory_id in due:
+                if factory_id not in monitor_scheduler:
+                    monitor_scheduler.schedule(factory_id, MONITOR_MIN_INTERVAL_SECONDS)
+            await asyncio.sleep(MONITOR_MIN_INTERVAL_SECONDS)
 
 # --- 6. API Endpoints ---
 @app.options("/{full_path:path}")
@@ -249,14 +535,66 @@ async def preflight_handler(full_path: str):
     """Handle CORS preflight requests"""
     return {}
 
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 once the model is loaded and warmed up and the
+    database is initialized, 503 (with per-component status) until then.
+    "failed" is terminal: the component won't become ready without a
+    restart, and "errors" says why.
+    """
+    status = dict(app.state.startup_status)
+    ready = all(state == "ready" for state in status.values())
+    if not ready:
+        return JSONResponse(status_code=503, content={
+            "ready": False, **status, "errors": dict(app.state.startup_errors)
+        })
+    return {"ready": True, **status}
+
+def validate_history_format(format: str):
+    if format not in HISTORY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(HISTORY_FORMATS)}")
+
+def validate_history_params(hours: float, points: int, method: str, max_hours: float = MAX_HISTORY_HOURS):
+    if not 0 < hours <= max_hours:
+        raise HTTPException(status_code=400, detail=f"hours must be in (0, {max_hours}]")
+    if not 3 <= points <= MAX_HISTORY_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be in [3, {MAX_HISTORY_POINTS}]")
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {list(DOWNSAMPLE_METHODS)}")
+
 @app.get("/api/dashboard-data")
-async def get_dashboard_data():
+async def get_dashboard_data(request: Request,
+                             history_hours: Optional[float] = None,
+                             history_points: int = MAX_HISTORY_LENGTH,
+                             history_method: str = "lttb",
+                             format: str = "rows"):
     """
     Provides all data needed to populate the dashboard.
     This replaces the old 'return db'
+
+    By default sensor_history holds the last MAX_HISTORY_LENGTH raw readings
+    per factory. With history_hours set, it instead covers that time range,
+    downsampled on the server to about history_points points per factory.
+
+    With format=columnar each factory's sensor_history is an object of
+    arrays ({timestamp: [epoch ms], pm2_5: [...], so2: [...], nox: [...]})
+    instead of a list of per-reading dicts. Responses are msgpack-encoded
+    if the client Accepts application/msgpack, and brotli/gzip-compressed
+    per Accept-Encoding.
     """
     if not app.state.pool:
         raise HTTPException(status_code=503, detail="Database not connected")
+    validate_history_format(format)
+    if history_hours is not None:
+        validate_history_params(history_hours, history_points, history_method, MAX_FLEET_HISTORY_HOURS)
 
     async with app.state.pool.acquire() as conn:
         # 1. Get all factory data and format as list of dicts
@@ -297,24 +635,38 @@ async def get_dashboard_data():
         protocol_state = await conn.fetchrow("SELECT admin_fund_balance FROM protocol_state WHERE id = 1")
         admin_fund = float(protocol_state['admin_fund_balance']) if protocol_state else 0.0
         
-        # 3. Get sensor history (this part is fine)
-        history_rows = await conn.fetch(
-            f"""
-            WITH ranked_readings AS (
-                SELECT
-                    factory_id, pm2_5, so2, nox, timestamp,
-                    ROW_NUMBER() OVER(PARTITION BY factory_id ORDER BY timestamp DESC) as rn
-                FROM sensor_readings
-            )
-            SELECT factory_id, pm2_5, so2, nox, timestamp
-            FROM ranked_readings
-            WHERE rn <= $1
-            ORDER BY factory_id, timestamp ASC;
-            """,
-            MAX_HISTORY_LENGTH
-        )
-        
+        # 3. Get sensor history
         sensor_history_dict = {row['id']: [] for row in factories_list}
+        if history_hours is not None or format == "columnar":
+            if history_hours is not None:
+                since = time.time() - history_hours * 3600
+                histories, _ = await fetch_downsampled_history(
+                    conn, since, history_points, history_method, list(sensor_history_dict)
+                )
+            else:
+                histories = await fetch_latest_history_arrays(conn, MAX_HISTORY_LENGTH)
+            to_output = history_to_columns if format == "columnar" else history_to_dicts
+            for factory_id, readings in histories.items():
+                if factory_id in sensor_history_dict:
+                    sensor_history_dict[factory_id] = to_output(readings)
+            history_rows = []
+        else:
+            history_rows = await conn.fetch(
+                f"""
+                WITH ranked_readings AS (
+                    SELECT
+                        factory_id, pm2_5, so2, nox, timestamp,
+                        ROW_NUMBER() OVER(PARTITION BY factory_id ORDER BY timestamp DESC) as rn
+                    FROM sensor_readings
+                )
+                SELECT factory_id, pm2_5, so2, nox, timestamp
+                FROM ranked_readings
+                WHERE rn <= $1
+                ORDER BY factory_id, timestamp ASC;
+                """,
+                MAX_HISTORY_LENGTH
+            )
+
         for row in history_rows:
             if row['factory_id'] in sensor_history_dict:
                 sensor_history_dict[row['factory_id']].append({
@@ -330,18 +682,72 @@ async def get_dashboard_data():
             "factories": factories_list, 
             "admin_fund": admin_fund,
             "sensor_history": sensor_history_dict,
-            "max_history_length": MAX_HISTORY_LENGTH
+            "max_history_length": MAX_HISTORY_LENGTH if history_hours is None else history_points,
+            "history_format": format
         }
         
-        return dashboard_data
+        return encode_response(request, dashboard_data)
     
+def format_forecast(factory_id: str, forecast: dict) -> dict:
+    """
+    Shapes a latest_forecasts entry as the frontend's ForecastData.
+    """
+    # Remaining steps of the trajectory this forecast was read from, for the
+    # forecast curve; statistical and DB-loaded forecasts have no curve
+    source = forecast['trajectory']
+    trajectory = source.remaining(recent_readings.count(factory_id)).tolist() if source is not None else []
+
+    # The frontend also expects a "confidence" score, which our DB doesn't store.
+    # We will hard-code it for now to match the frontend's expectation.
+    return {
+        "factory_id": factory_id,
+        "forecast_breach": forecast['breach_predicted'],
+        "confidence": 0.95,  # Mocking this as the frontend needs it
+        "predicted_aqi": forecast['predicted_value'],
+        "timestamp": forecast['timestamp'].isoformat(),
+        "next_check": (forecast['timestamp'] + datetime.timedelta(seconds=10)).isoformat(),
+        "trajectory": trajectory
+    }
+
+@app.get("/api/forecast")
+async def get_forecasts(factory_ids: str = ""):
+    """
+    Provides the latest forecast for many factories in one response,
+    straight from the monitor's in-memory map (no DB queries).
+    
+    Args:
+        factory_ids: Comma-separated factory ids; empty means all factories.
+    """
+    requested = [fid.strip() for fid in factory_ids.split(",") if fid.strip()]
+    if not requested:
+        requested = latest_forecasts.factory_ids()
+
+    forecasts, missing = [], []
+    for factory_id in requested:
+        forecast = latest_forecasts.get(factory_id)
+        if forecast:
+            forecasts.append(format_forecast(factory_id, forecast))
+        else:
+            missing.append(factory_id)
+
+    return {
+        "forecasts": forecasts,
+        "missing": missing
+    }
+
 # --- ADD THIS NEW ENDPOINT ---
 @app.get("/api/forecast/{factory_id}")
 async def get_forecast_by_id(factory_id: str):
     """
     Provides forecast data for a *single* factory.
     This is what the frontend's aiApiClient.ts is looking for.
+    Served from the monitor's in-memory map; the DB is only consulted for
+    factories the monitor hasn't forecast since startup.
     """
+    forecast = latest_forecasts.get(factory_id)
+    if forecast:
+        return format_forecast(factory_id, forecast)
+
     if not app.state.pool:
         raise HTTPException(status_code=503, detail="Database not connected")
 
@@ -358,19 +764,134 @@ async def get_forecast_by_id(factory_id: str):
             factory_id
         )
 
-        if not forecast_row:
-            raise HTTPException(status_code=404, detail="No forecast data found for this factory.")
+    if not forecast_row:
+        raise HTTPException(status_code=404, detail="No forecast data found for this factory.")
 
-        # The frontend also expects a "confidence" score, which our DB doesn't store.
-        # We will hard-code it for now to match the frontend's expectation.
-        return {
-            "factory_id": factory_id,
-            "forecast_breach": forecast_row['breach_predicted'],
-            "confidence": 0.95,  # Mocking this as the frontend needs it
-            "predicted_aqi": float(forecast_row['predicted_value']),
-            "timestamp": forecast_row['timestamp'].isoformat(),
-            "next_check": (forecast_row['timestamp'] + datetime.timedelta(seconds=10)).isoformat()
-        }
+    latest_forecasts.update(
+        factory_id, forecast_row['predicted_value'], forecast_row['breach_predicted'], forecast_row['timestamp']
+    )
+    return format_forecast(factory_id, latest_forecasts.get(factory_id))
+
+@app.get("/api/history/{factory_id}")
+async def get_history(request: Request, factory_id: str, hours: float = 24.0, points: int = 300,
+                      method: str = "lttb", format: str = "rows"):
+    """
+    Long-range history for one factory, downsampled on the server so days
+    of readings chart as a few hundred points.
+    
+    Args:
+        hours: How far back to go.
+        points: Target number of points (LTTB returns exactly this many).
+        method: 'lttb' (shape-preserving) or 'minmax' (keeps every bucket's extremes).
+        format: 'rows' (list of reading dicts) or 'columnar' (one array per field).
+    """
+    if not app.state.pool:
+        raise HTTPException(status_code=503, detail="Database not connected")
+    validate_history_params(hours, points, method)
+    validate_history_format(format)
+
+    async with app.state.pool.acquire() as conn:
+        histories, totals = await fetch_downsampled_history(
+            conn, time.time() - hours * 3600, points, method, [factory_id]
+        )
+
+    sampled = histories.get(factory_id)
+    if sampled is None:
+        raise HTTPException(status_code=404, detail="No readings found for this factory in that range.")
+
+    return encode_response(request, {
+        "factory_id": factory_id,
+        "method": method,
+        "total_readings": totals[factory_id],
+        "points": len(sampled),
+        "history_format": format,
+        "history": history_to_columns(sampled) if format == "columnar" else history_to_dicts(sampled)
+    })
+
+# --- BULK SENSOR INGESTION ENDPOINT ---
+@app.post("/api/readings/batch", status_code=202)
+async def ingest_readings(request: Request):
+    """
+    Accepts many readings for many factories in one request, either as
+    NDJSON (application/x-ndjson) or the compact binary format described
+    in ingestion.py (application/octet-stream). Readings are queued and
+    written in bulk; when the queue is full the request is rejected with
+    429 and a Retry-After hint.
+    """
+    if not app.state.pool:
+        raise HTTPException(status_code=503, detail="Database not connected")
+
+    # Reject oversized bodies before reading them (and while streaming,
+    # for chunked requests without a Content-Length)
+    too_large = HTTPException(status_code=413, detail=f"Request body too large (max {INGEST_MAX_BODY_BYTES} bytes)")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > INGEST_MAX_BODY_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > INGEST_MAX_BODY_BYTES:
+            raise too_large
+
+    # Parse in a worker thread so a large body doesn't stall the event loop
+    content_type = request.headers.get("content-type", "")
+    parse = parse_binary if content_type.startswith("application/octet-stream") else parse_ndjson
+    try:
+        batch = await asyncio.to_thread(parse, bytes(body))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+
+    if len(batch) > INGEST_MAX_BATCH_READINGS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch)} readings (max {INGEST_MAX_BATCH_READINGS})"
+        )
+
+    if not ingest_queue.offer(batch):
+        retry_after = ingest_queue.retry_after_seconds(ingest_stats.get("drain_rate", 0.0))
+        raise HTTPException(
+            status_code=429,
+            detail="Ingestion queue is full, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    return {
+        "success": True,
+        "accepted": len(batch),
+        "queued": ingest_queue.pending
+    }
+
+@app.get("/api/readings/ingest-stats")
+async def get_ingest_stats():
+    """
+    Queue depth and throughput counters for the ingestion pipeline.
+    """
+    return {
+        "queued": ingest_queue.pending,
+        "capacity": ingest_queue.max_readings,
+        "accepted_total": ingest_queue.accepted_total,
+        "rejected_total": ingest_queue.rejected_total,
+        "written_total": ingest_stats.get("written_total", 0),
+        "failed_total": ingest_stats.get("failed_total", 0),
+        "write_errors": ingest_stats.get("write_errors", 0),
+        "drain_rate": round(ingest_stats.get("drain_rate", 0.0), 1)
+    }
+
+@app.get("/api/monitor/stats")
+async def get_monitor_stats():
+    """
+    Forecasting counters for the monitor: model inferences vs. ticks served
+    from a cached trajectory, and how many LSTM calls the statistical
+    pre-filter avoided (with an audit-based estimate of alert recall).
+    """
+    return {
+        "horizon": forecaster.horizon,
+        "tolerance": FORECAST_TOLERANCE,
+        **forecast_cache.stats(),
+        "prefilter": tiered_forecaster.stats(),
+        "scheduler": monitor_scheduler.stats(),
+        "events": event_bus.stats()
+    }
 
 # --- ADD FACTORY REGISTRATION ENDPOINT ---
 @app.post("/api/factory-registration")
@@ -429,6 +950,17 @@ async def predict_aqi(data: PredictionRequest):
     Predicts the next AQI value based on a history of readings.
     Uses the loaded LSTM model.
     """
+    # forecaster.ready flips before warm-up finishes; wait for the whole
+    # startup step so no request pays the cold-start cost
+    model_status = app.state.startup_status["model"]
+    if model_status == "failed":
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model failed to load: {app.state.startup_errors.get('model')}. Predictions are unavailable until the server is restarted."
+        )
+    if model_status != "ready":
+        raise HTTPException(status_code=503, detail="Model is still loading, retry shortly")
+
     try:
         # The forecaster expects a list of floats
         history = data.data_history
@@ -440,9 +972,9 @@ async def predict_aqi(data: PredictionRequest):
             padding = [history[0]] * (forecaster.look_back - len(history))
             history = padding + history
             
-        # Get prediction
-        # predict_breach returns (is_breach, predicted_value)
-        _, predicted_value = forecaster.predict_breach(history)
+        # Get prediction: the whole trajectory from one model pass
+        trajectory = forecaster.predict_trajectory(history)
+        predicted_value = float(trajectory[forecaster.lead_index()]) if len(trajectory) else 0.0
         
         current_value = history[-1]
         
@@ -451,7 +983,9 @@ async def predict_aqi(data: PredictionRequest):
             "current_aqi": current_value,
             "predicted_aqi": predicted_value,
             "trend": "INCREASING" if predicted_value > current_value else "DECREASING",
-            "difference": float(round(predicted_value - current_value, 2))
+            "difference": float(round(predicted_value - current_value, 2)),
+            # A single-output model has no per-step curve to show
+            "trajectory": trajectory.tolist() if forecaster.horizon > 1 else []
         }
 
     except Exception as e:
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from iot_simulator import simulate_fleet
+from tiered_forecaster import rolling_statistical_forecast
+
+# Defaults mirror main.py
+FORECAST_ALERT_THRESHOLD = 150.0
+ACTUAL_PENALTY_THRESHOLD = 200.0
+SLASH_AMOUNT = 10.0
+INITIAL_STAKE = 100.0
+LOOK_BACK = 20
+LOOK_FORWARD = 3
+# Spike ceiling for generated data. The live simulators cap at 220, which
+# would make any penalty threshold >= 220 unreachable by construction.
+GENERATED_MAX_LEVEL = 300.0
+
+# The current rules plus the DAO proposals in DAO_VOTING_SCHEMA.sql
+DEFAULT_CONFIGS = [
+    {"name": "current", "penalty_threshold": ACTUAL_PENALTY_THRESHOLD, "slash_amount": SLASH_AMOUNT},
+    {"name": "prop-001 threshold 220", "penalty_threshold": 220.0, "slash_amount": 10.0},
+    {"name": "prop-003 slash 15", "penalty_threshold": 200.0, "slash_amount": 15.0},
+    {"name": "prop-001 + prop-003", "penalty_threshold": 220.0, "slash_amount": 15.0},
+]
+
+
+def forecast_series(readings: np.ndarray, method: str = "statistical",
+                    model_path: str = "lstm_model.keras", scaler_path: str = "scaler.joblib",
+                    batch_size: int = 65_536) -> np.ndarray:
+    """
+    Headline forecast after every reading: [i, t] predicts reading t + LOOK_FORWARD
+    of factory i. NaN where there isn't a full window yet. Forecasts don't
+    depend on policy, so they are computed once and shared by all configs.
+
+    Args:
+        method: 'statistical' (vectorized EWMA + trend, fast) or 'lstm'
+            (the monitor's model, batched over all windows; needs TensorFlow).
+    """
+    if method == "statistical":
+        return rolling_statistical_forecast(readings, LOOK_BACK, LOOK_FORWARD)
+    if method != "lstm":
+        raise ValueError(f"Unknown forecast method '{method}'. Use 'statistical' or 'lstm'")
+
+    from ai_forecaster import LSTMForecaster
+
+    forecaster = LSTMForecaster(model_path=model_path, scaler_path=scaler_path, lead=LOOK_FORWARD)
+    look_back = forecaster.look_back
+    forecast = np.full(readings.shape, np.nan)
+    if not forecaster.ready or readings.shape[1] < look_back:
+        return forecast
+
+    windows = np.lib.stride_tricks.sliding_window_view(readings, look_back, axis=1)
+    n_windows = windows.shape[1]
+    flat = windows.reshape(-1, look_back)
+    values = np.full(len(flat), np.nan)
+    valid = ~np.isnan(flat).any(axis=1)
+    valid_idx = np.flatnonzero(valid)
+    for start in range(0, len(valid_idx), batch_size):
+        idx = valid_idx[start:start + batch_size]
+        trajectories = forecaster.predict_trajectories(flat[idx])
+        if len(trajectories):
+            values[idx] = trajectories[:, forecaster.lead_index()]
+    forecast[:, look_back - 1:] = values.reshape(readings.shape[0], n_windows)
+    return forecast
+
+
+def _replay_chunk(readings: np.ndarray, forecast: np.ndarray, stake0: np.ndarray,
+                  penalty: np.ndarray, slash: np.ndarray, alert: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Applies the rules to a block of factories for every config at once.
+    Config parameters are (C, 1, 1) so they broadcast against (factory, time);
+    all returned totals are additive across factory blocks.
+    """
+    stake0 = stake0[None, :, None]
+    breach = readings[None] > penalty                      # (C, N, T)
+    alerts = ~breach & (forecast[None] > alert)            # (C, N, T)
+
+    breaches_so_far = np.cumsum(breach, axis=2, dtype=np.int32)
+    stake = np.maximum(stake0 - slash * breaches_so_far, 0.0)
+    stake_before = np.maximum(stake0 - slash * (breaches_so_far - breach), 0.0)
+    slash_events = breach & (stake_before > 0)
+
+    return {
+        "total_slashed": (stake0[..., 0] - stake[..., -1]).sum(axis=1),
+        "slash_events": slash_events.sum(axis=(1, 2)),
+        "breaches": breach.sum(axis=(1, 2)),
+        "alerts": alerts.sum(axis=(1, 2)),
+        "factories_alerted": alerts.any(axis=2).sum(axis=1),
+        "factories_slashed": slash_events.any(axis=2).sum(axis=1),
+        "factories_depleted": (stake[..., -1] <= 0).sum(axis=1),
+        "fleet_stake": stake.sum(axis=1),                  # (C, T)
+    }
+
+
+def replay(readings: np.ndarray, configs: List[dict], forecast: Optional[np.ndarray] = None,
+           initial_stake=INITIAL_STAKE, trajectory_points: int = 100,
+           factories_per_chunk: int = 500) -> List[dict]:
+    """
+    Replays readings through the monitor's penalty and alert rules for
+    several policy configurations at once.
+
+    Every reading is treated as one monitor check: a reading above the
+    config's penalty threshold slashes min(stake, slash_amount); otherwise
+    a forecast above its alert threshold raises an alert. Rules are
+    broadcast over (config, factory, timestep). Since each slash is a fixed
+    amount clipped at zero, a factory's stake after t readings is just
+    max(initial - slash * breaches_so_far, 0), so no sequential loop is needed.
+    Factories are processed in blocks of `factories_per_chunk` to bound memory.
+
+    Args:
+        readings: PM2.5 readings of shape (n_factories, n_steps); NaN = no reading.
+        configs: Dicts with 'name', 'penalty_threshold', 'slash_amount' and
+            optionally 'alert_threshold'.
+        forecast: Output of forecast_series(); computed if omitted.
+        initial_stake: Scalar or one starting stake per factory.
+        trajectory_points: Samples of the fleet-stake trajectory to report.
+
+    Returns:
+        One result dict per config.
+    """
+    readings = np.asarray(readings, dtype=np.float64)
+    if forecast is None:
+        forecast = forecast_series(readings)
+    n_factories, n_steps = readings.shape
+
+    penalty = np.array([c["penalty_threshold"] for c in configs], dtype=np.float64)[:, None, None]
+    slash = np.array([c["slash_amount"] for c in configs], dtype=np.float64)[:, None, None]
+    alert = np.array([c.get("alert_threshold", FORECAST_ALERT_THRESHOLD) for c in configs],
+                     dtype=np.float64)[:, None, None]
+    stake0 = np.broadcast_to(np.asarray(initial_stake, dtype=np.float64), (n_factories,))
+
+    totals: Dict[str, np.ndarray] = {}
+    for lo in range(0, n_factories, factories_per_chunk):
+        hi = lo + factories_per_chunk
+        chunk = _replay_chunk(readings[lo:hi], forecast[lo:hi], stake0[lo:hi], penalty, slash, alert)
+        for key, value in chunk.items():
+            totals[key] = totals[key] + value if key in totals else value
+
+    sample_at = np.unique(np.linspace(0, n_steps - 1, min(trajectory_points, n_steps)).astype(np.int64))
+    results = []
+    for c, config in enumerate(configs):
+        fleet_stake = totals["fleet_stake"][c] if totals else np.zeros(n_steps)
+        results.append({
+            **config,
+            "alert_threshold": float(alert[c, 0, 0]),
+            "total_slashed": round(float(totals["total_slashed"][c]), 2) if totals else 0.0,
+            "slash_events": int(totals["slash_events"][c]) if totals else 0,
+            "breaches": int(totals["breaches"][c]) if totals else 0,
+            "alerts": int(totals["alerts"][c]) if totals else 0,
+            "factories_alerted": int(totals["factories_alerted"][c]) if totals else 0,
+            "factories_slashed": int(totals["factories_slashed"][c]) if totals else 0,
+            "factories_depleted": int(totals["factories_depleted"][c]) if totals else 0,
+            "final_fleet_stake": round(float(fleet_stake[-1]), 2) if n_steps else 0.0,
+            "stake_trajectory": {
+                "step": sample_at.tolist(),
+                "fleet_stake": np.round(fleet_stake[sample_at], 2).tolist() if n_steps else [],
+            },
+        })
+    return results
+
+
+# --- Data sources ---
+def load_generated(n_factories: int, n_steps: int, seed: Optional[int] = None,
+                   max_level: float = GENERATED_MAX_LEVEL) -> np.ndarray:
+    """
+    A synthetic fleet with base levels like the demo factories (60-100).
+    Spikes are capped at `max_level`, which must lie above the candidate
+    penalty thresholds for the comparison to mean anything.
+    """
+    rng = np.random.default_rng(seed)
+    base_levels = rng.uniform(60, 100, n_factories)
+    spike_chance = rng.uniform(0.01, 0.06, n_factories)
+    return simulate_fleet(n_steps, base_levels, max_level=max_level, spike_chance=spike_chance, seed=seed)
+
+
+def load_csv(path: str, n_factories: int) -> np.ndarray:
+    """ Splits a single recorded series (e.g. training_data.csv) into n_factories segments. """
+    pm = pd.read_csv(path)["pm2_5"].values.astype(float)
+    n_steps = len(pm) // n_factories
+    return pm[:n_factories * n_steps].reshape(n_factories, n_steps)
+
+
+# Peak PM2.5 per factory and time bucket (one bucket = one monitor check)
+DB_READINGS_QUERY = """
+    SELECT factory_id,
+           floor((EXTRACT(EPOCH FROM timestamp) - $1::float8) / $2::float8)::int AS step,
+           MAX(pm2_5)::float8 AS pm2_5
+    FROM sensor_readings
+    WHERE timestamp >= to_timestamp($1::float8)
+    GROUP BY factory_id, step
+"""
+
+
+def load_db(database_url: str, hours: float, bucket_seconds: float = 60.0):
+    """
+    Loads the last `hours` of sensor_readings onto a shared time grid of
+    `bucket_seconds` buckets, so column t is the same wall-clock interval
+    for every factory and fleet_stake[t] sums stakes at one point in time.
+    Each cell is the bucket's peak reading (like a monitor check judging
+    the highest reading since the last one); NaN where a factory sent
+    nothing. Starting stakes are the factories' current stake_balance.
+
+    Returns:
+        (readings of shape (n_factories, n_steps), initial stakes, factory ids)
+    """
+    import asyncpg
+
+    since = time.time() - hours * 3600
+    n_steps = max(1, int(np.ceil(hours * 3600 / bucket_seconds)))
+
+    async def fetch():
+        conn = await asyncpg.connect(database_url)
+        try:
+            rows = await conn.fetch(DB_READINGS_QUERY, since, bucket_seconds)
+            stakes = await conn.fetch("SELECT id, stake_balance::float8 AS stake_balance FROM factories")
+            return rows, stakes
+        finally:
+            await conn.close()
+
+    rows, stake_rows = asyncio.run(fetch())
+    factory_ids = sorted({row['factory_id'] for row in rows})
+    readings = np.full((len(factory_ids), n_steps), np.nan)
+    if rows:
+        index = {fid: i for i, fid in enumerate(factory_ids)}
+        f = np.array([index[row['factory_id']] for row in rows])
+        t = np.clip(np.array([row['step'] for row in rows]), 0, n_steps - 1)
+        np.fmax.at(readings, (f, t), np.array([row['pm2_5'] for row in rows]))
+
+    stake_by_id = {row['id']: row['stake_balance'] for row in stake_rows}
+    stakes = np.array([stake_by_id.get(fid, INITIAL_STAKE) for fid in factory_ids], dtype=np.float64)
+    return readings, stakes, factory_ids
+
+
+def parse_config(spec: str) -> dict:
+    """ 'penalty:slash[:alert]', e.g. '220:15' or '200:10:140'. """
+    parts = [float(p) for p in spec.split(":")]
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"Expected penalty:slash[:alert], got '{spec}'")
+    config = {"name": spec, "penalty_threshold": parts[0], "slash_amount": parts[1]}
+    if len(parts) == 3:
+        config["alert_threshold"] = parts[2]
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay sensor data through slashing policies to compare DAO proposals."
+    )
+    parser.add_argument("--source", choices=["generated", "csv", "db"], default="generated")
+    parser.add_argument("--factories", type=int, default=1000, help="generated/csv: number of factories")
+    parser.add_argument("--steps", type=int, default=1000, help="generated: readings per factory")
+    parser.add_argument("--seed", type=int, default=None, help="generated: random seed")
+    parser.add_argument("--max-level", type=float, default=GENERATED_MAX_LEVEL,
+                        help="generated: spike ceiling; keep it above the penalty thresholds")
+    parser.add_argument("--file", default="training_data.csv", help="csv: input file")
+    parser.add_argument("--hours", type=float, default=24 * 7, help="db: history range")
+    parser.add_argument("--bucket-seconds", type=float, default=60.0,
+                        help="db: time bucket per step; each bucket's peak reading is one check")
+    parser.add_argument("--forecaster", choices=["statistical", "lstm"], default="statistical")
+    parser.add_argument("--config", type=parse_config, action="append",
+                        help="penalty:slash[:alert]; repeatable. Defaults to current rules + DAO proposals")
+    parser.add_argument("--initial-stake", type=float, default=None,
+                        help=f"Starting stake per factory (default: stake_balance for db, {INITIAL_STAKE} otherwise)")
+    parser.add_argument("--json", help="Write full results (including stake trajectories) to this file")
+    args = parser.parse_args()
+
+    print(f"Loading readings from {args.source}...")
+    start_time = time.time()
+    initial_stake = INITIAL_STAKE
+    if args.source == "generated":
+        readings = load_generated(args.factories, args.steps, args.seed, args.max_level)
+    elif args.source == "csv":
+        readings = load_csv(args.file, args.factories)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+        database_url = os.getenv("DATABASE_URL")
+        if not database_url:
+            raise ValueError("DATABASE_URL not set in .env file")
+        readings, initial_stake, _ = load_db(database_url, args.hours, args.bucket_seconds)
+    if args.initial_stake is not None:
+        initial_stake = args.initial_stake
+    print(f"{readings.shape[0]} factories x {readings.shape[1]} steps "
+          f"({int(np.count_nonzero(~np.isnan(readings)))} readings) in {time.time() - start_time:.2f} seconds.")
+
+    start_time = time.time()
+    forecast = forecast_series(readings, args.forecaster)
+    print(f"Forecasts ({args.forecaster}) took {time.time() - start_time:.2f} seconds.")
+
+    configs = args.config or DEFAULT_CONFIGS
+    peak = float(np.nanmax(readings)) if np.isfinite(readings).any() else float("nan")
+    unreachable = [c["name"] for c in configs if not peak > c["penalty_threshold"]]
+    if unreachable:
+        print(f"WARNING: no reading exceeds the penalty threshold of {unreachable} (max reading {peak:.1f}); "
+              f"they will report 0 slashed regardless of the policy.")
+
+    start_time = time.time()
+    results = replay(readings, configs, forecast, initial_stake=initial_stake)
+    print(f"Replayed {len(configs)} configurations in {time.time() - start_time:.2f} seconds.\n")
+
+    print(f"{'config':<24} {'slashed':>10} {'slashes':>8} {'alerts':>8} {'alerted':>8} "
+          f"{'slashed f.':>10} {'depleted':>9} {'final stake':>12}")
+    for r in results:
+        print(f"{r['name']:<24} {r['total_slashed']:>10.1f} {r['slash_events']:>8} {r['alerts']:>8} "
+              f"{r['factories_alerted']:>8} {r['factories_slashed']:>10} {r['factories_depleted']:>9} "
+              f"{r['final_fleet_stake']:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nFull results saved to {args.json}")
@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class MonitorScheduler:
+    """
+    Earliest-deadline-first scheduler giving each factory its own check
+    cadence. Factories in ALERT/PENALTY are checked every `min_interval`;
+    others back off towards `max_interval` the further they sit below the
+    alert threshold and the calmer their recent readings are. Intervals
+    are jittered so factories don't synchronize, and a token bucket caps
+    the total number of checks per second across the fleet.
+    """
+    def __init__(self, threshold: float, min_interval: float = 1.0, max_interval: float = 30.0,
+                 max_checks_per_second: float = 200.0, jitter: float = 0.1,
+                 headroom_scale: float = 60.0, volatility_scale: float = 5.0):
+        self.threshold = threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_checks_per_second = max_checks_per_second
+        self.jitter = jitter
+        self.headroom_scale = headroom_scale
+        self.volatility_scale = volatility_scale
+
+        self._heap: list = []
+        self._due: Dict[str, float] = {}  # Current deadline per factory; stale heap entries are skipped
+        self._counter = itertools.count()
+        self._tokens = max_checks_per_second
+        self._last_refill = time.monotonic()
+
+        self.checks = 0
+        self.late_checks = 0      # Checks that ran more than one min_interval after their deadline
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def __contains__(self, factory_id: str) -> bool:
+        return factory_id in self._due
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, factory_id: str, delay: float, now: Optional[float] = None):
+        due = (now if now is not None else time.monotonic()) + delay
+        self._due[factory_id] = due
+        heapq.heappush(self._heap, (due, next(self._counter), factory_id))
+
+    def expedite(self, factory_id: str, now: Optional[float] = None):
+        """ Pulls a factory's next check forward to now (e.g. on a worrying reading). """
+        now = now if now is not None else time.monotonic()
+        if self._due.get(factory_id, now) > now:
+            self.schedule(factory_id, 0.0, now)
+
+    def interval_for(self, status: str, history: List[float]) -> float:
+        """ Seconds until the next check of a factory with this status and window. """
+        if status in ("ALERT", "PENALTY") or not history:
+            return self.min_interval
+
+        values = np.asarray(history, dtype=np.float64)
+        headroom = np.clip((self.threshold - values[-1]) / self.headroom_scale, 0.0, 1.0)
+        volatility = np.std(np.diff(values)) if len(values) > 2 else 0.0
+        calm = 1.0 / (1.0 + volatility / self.volatility_scale)
+        return float(self.min_interval + (self.max_interval - self.min_interval) * headroom * calm)
+
+    def reschedule(self, factory_id: str, status: str, history: List[float], now: Optional[float] = None):
+        interval = self.interval_for(status, history)
+        interval *= random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+        self.schedule(factory_id, max(interval, self.min_interval * (1.0 - self.jitter)), now)
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.max_checks_per_second, self._tokens + elapsed * self.max_checks_per_second)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """
+        Returns the factories whose deadline has passed, earliest first,
+        as far as the global rate cap allows. The rest stay queued.
+        """
+        now = now if now is not None else time.monotonic()
+        self._refill(now)
+        due = []
+        while self._heap and self._heap[0][0] <= now and self._tokens >= 1.0:
+            deadline, _, factory_id = heapq.heappop(self._heap)
+            if self._due.get(factory_id) != deadline:
+                continue  # Superseded by a later schedule()/expedite()
+            del self._due[factory_id]
+            self._tokens -= 1.0
+
+            lateness = now - deadline
+            self.checks += 1
+            self.total_lateness += lateness
+            self.max_lateness = max(self.max_lateness, lateness)
+            if lateness > self.min_interval:
+                self.late_checks += 1
+            due.append(factory_id)
+        return due
+
+    def seconds_until_next(self, now: Optional[float] = None) -> float:
+        """ How long the monitor can sleep before something is due (or a token frees up). """
+        now = now if now is not None else time.monotonic()
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return self.min_interval
+        wait = self._heap[0][0] - now
+        if self._tokens < 1.0:
+            wait = max(wait, (1.0 - self._tokens) / self.max_checks_per_second)
+        return max(0.0, min(wait, self.min_interval))
+
+    def stats(self) -> dict:
+        return {
+            "factories": len(self._due),
+            "checks": self.checks,
+            "late_checks": self.late_checks,
+            "avg_lateness": round(self.total_lateness / self.checks, 3) if self.checks else 0.0,
+            "max_lateness": round(self.max_lateness, 3),
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "max_checks_per_second": self.max_checks_per_second,
+        }
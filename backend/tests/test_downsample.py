@@ -0,0 +1,137 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from downsample import _bucket_edges, downsample_indices, lttb_indices, minmax_indices
+from history import HISTORY_DTYPE, fetch_downsampled_history, history_to_columns, split_by_factory
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.cumsum(rng.normal(0, 1, n))
+    return x, y
+
+
+def reference_lttb(x, y, n_out):
+    """ Straightforward per-point LTTB, used to check the vectorized version. """
+    n = len(x)
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    selected, prev = [0], 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 1 < n_out - 2:
+            nlo, nhi = edges[b + 1], edges[b + 2]
+            avg_x, avg_y = np.mean(x[nlo:nhi]), np.mean(y[nlo:nhi])
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        best, best_area = lo, -1.0
+        for i in range(lo, hi):
+            area = abs((x[prev] - avg_x) * (y[i] - y[prev]) - (x[prev] - x[i]) * (avg_y - y[prev]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        prev = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+# --- LTTB ---
+@pytest.mark.parametrize("n, n_out", [(1000, 50), (1001, 3), (97, 10), (10_000, 300)])
+def test_lttb_index_invariants(n, n_out):
+    x, y = series(n)
+    idx = lttb_indices(x, y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert np.all(np.diff(idx) > 0)
+    # Exactly one point from each inner bucket
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    assert np.all((idx[1:-1] >= edges[:-1]) & (idx[1:-1] < edges[1:]))
+
+
+@pytest.mark.parametrize("n, n_out", [(500, 20), (123, 7), (2000, 100)])
+def test_lttb_matches_reference(n, n_out):
+    x, y = series(n, seed=n)
+    np.testing.assert_array_equal(lttb_indices(x, y, n_out), reference_lttb(x, y, n_out))
+
+
+def test_lttb_short_series_and_small_targets():
+    x, y = series(10)
+    np.testing.assert_array_equal(lttb_indices(x, y, 10), np.arange(10))
+    np.testing.assert_array_equal(lttb_indices(x, y, 50), np.arange(10))
+    # Fewer than 3 points can't keep both ends plus a bucket; clamped to 3
+    assert len(lttb_indices(x, y, 1)) == 3
+    assert len(lttb_indices(x[:0], y[:0], 5)) == 0
+
+
+# --- Min/max ---
+@pytest.mark.parametrize("n, n_out", [(1000, 50), (1001, 51), (10, 4), (100_003, 300)])
+def test_minmax_index_invariants(n, n_out):
+    _, y = series(n)
+    idx = minmax_indices(y, n_out)
+    assert len(idx) <= n_out
+    assert np.all(np.diff(idx) > 0)
+    assert np.argmin(y) in idx and np.argmax(y) in idx
+    # Every bucket's extremes are kept
+    edges = _bucket_edges(n, max(1, n_out // 2))
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        assert lo + np.argmin(y[lo:hi]) in idx
+        assert lo + np.argmax(y[lo:hi]) in idx
+
+
+def test_minmax_keeps_isolated_spike():
+    y = np.full(10_000, 80.0)
+    y[4321] = 300.0
+    assert 4321 in minmax_indices(y, 20)
+
+
+def test_minmax_short_series_returns_everything():
+    np.testing.assert_array_equal(minmax_indices(np.arange(5.0), 10), np.arange(5))
+
+
+def test_downsample_indices_rejects_unknown_method():
+    with pytest.raises(ValueError, match="Unknown downsampling method"):
+        downsample_indices(np.arange(10.0), np.arange(10.0), 5, "stride")
+
+
+# --- History helpers ---
+def history(factory_id, n, start=0.0):
+    data = np.zeros(n, dtype=HISTORY_DTYPE)
+    data["factory_id"] = factory_id
+    data["timestamp"] = start + np.arange(n)
+    data["pm2_5"] = np.arange(n) % 17
+    return data
+
+
+def test_split_by_factory_and_columns():
+    parts = split_by_factory(np.concatenate([history("a", 3), history("b", 2, start=0.5)]))
+    assert sorted(parts) == ["a", "b"]
+    assert len(parts["a"]) == 3 and len(parts["b"]) == 2
+    columns = history_to_columns(parts["b"])
+    assert columns["timestamp"].tolist() == [500, 1500]
+    assert columns["timestamp"].dtype == np.int64
+    assert split_by_factory(np.zeros(0, dtype=HISTORY_DTYPE)) == {}
+
+
+class FakeConn:
+    """ Returns pre-bucketed rows, as BUCKETED_HISTORY_QUERY would. """
+    def __init__(self, rows):
+        self.rows = rows
+        self.args = None
+
+    async def fetch(self, query, *args):
+        self.args = args
+        return self.rows
+
+
+@pytest.mark.parametrize("method, buckets", [("minmax", 50), ("lttb", 200)])
+def test_fetch_downsampled_history_reduces_bucketed_rows(method, buckets):
+    rows = [("a", float(t), float(t % 17), 1.0, 2.0, 5000) for t in range(2 * buckets)]
+    rows += [("b", 0.0, 1.0, 1.0, 2.0, 1)]
+    conn = FakeConn(rows)
+    histories, totals = asyncio.run(fetch_downsampled_history(conn, 0.0, 100, method))
+    assert conn.args[2] == buckets
+    assert totals == {"a": 5000, "b": 1}
+    assert len(histories["a"]) <= 100
+    assert len(histories["b"]) == 1
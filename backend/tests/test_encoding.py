@@ -0,0 +1,111 @@
+import datetime
+import gzip
+import json
+import uuid
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from starlette.requests import Request
+
+import encoding
+from encoding import COMPRESS_MIN_BYTES, _accepts, dumps_json, encode_response
+
+LARGE = {"readings": list(range(COMPRESS_MIN_BYTES))}
+SMALL = {"ok": True}
+
+
+def make_request(accept="", accept_encoding=""):
+    headers = [(b"accept", accept.encode()), (b"accept-encoding", accept_encoding.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("header, token, expected", [
+    ("gzip, br", "br", True),
+    ("GZIP;q=0.5", "gzip", True),
+    ("br;q=0, gzip", "br", False),
+    ("br;q=0.0", "br", False),
+    ("br;q=oops", "br", False),
+    ("identity", "gzip", False),
+    ("", "gzip", False),
+    ("application/json, application/msgpack;q=0.9", "application/msgpack", True),
+])
+def test_accepts_honours_q_values(header, token, expected):
+    assert _accepts(header, token) is expected
+
+
+def test_dumps_json_serializes_numpy_decimal_uuid_and_datetimes():
+    factory = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    at = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    payload = {
+        "score": Decimal("87.50"),
+        "id": factory,
+        "at": at,
+        "values": np.array([1.5, 2.5]),
+        "count": np.int64(3),
+    }
+    assert json.loads(dumps_json(payload)) == {
+        "score": 87.5,
+        "id": str(factory),
+        "at": at.isoformat(),
+        "values": [1.5, 2.5],
+        "count": 3,
+    }
+
+
+def test_dumps_json_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps_json({"x": object()})
+
+
+def test_small_bodies_are_sent_uncompressed_json():
+    response = encode_response(make_request(accept_encoding="gzip, br"), SMALL)
+    assert response.media_type == "application/json"
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert json.loads(response.body) == SMALL
+
+
+def test_large_bodies_are_gzipped_when_accepted():
+    response = encode_response(make_request(accept_encoding="gzip"), LARGE)
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.body)) == LARGE
+
+
+def test_gzip_with_q_zero_is_not_used():
+    response = encode_response(make_request(accept_encoding="gzip;q=0"), LARGE)
+    assert "content-encoding" not in response.headers
+    assert json.loads(response.body) == LARGE
+
+
+def test_brotli_falls_back_to_gzip_when_not_installed(monkeypatch):
+    monkeypatch.setattr(encoding, "brotli", None)
+    response = encode_response(make_request(accept_encoding="br, gzip"), LARGE)
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def test_brotli_preferred_when_installed():
+    brotli = pytest.importorskip("brotli")
+    response = encode_response(make_request(accept_encoding="gzip, br"), LARGE)
+    assert response.headers["content-encoding"] == "br"
+    assert json.loads(brotli.decompress(response.body)) == LARGE
+
+    response = encode_response(make_request(accept_encoding="gzip, br;q=0"), LARGE)
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def test_msgpack_ignored_when_not_installed(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    response = encode_response(make_request(accept="application/msgpack"), SMALL)
+    assert response.media_type == "application/json"
+
+
+def test_msgpack_negotiated_from_accept():
+    msgpack = pytest.importorskip("msgpack")
+    payload = {"score": Decimal("1.25"), "values": np.array([1, 2])}
+    response = encode_response(make_request(accept="application/x-msgpack"), payload)
+    assert response.media_type == "application/msgpack"
+    assert msgpack.unpackb(response.body) == {"score": 1.25, "values": [1, 2]}
+
+    response = encode_response(make_request(accept="application/msgpack;q=0, application/json"), payload)
+    assert response.media_type == "application/json"
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from events import EventBus, ForecastAlert, SlashTriggered, StatusChanged
+
+
+class FakeOutboxPool:
+    """ In-memory stand-in for the event_outbox table, driven by the bus's SQL. """
+    def __init__(self):
+        self.rows = {}
+        self.fail_inserts = 0
+
+    async def execute(self, query, *args):
+        if "INSERT INTO event_outbox" in query:
+            if self.fail_inserts:
+                self.fail_inserts -= 1
+                raise ConnectionError("outbox unavailable")
+            for row_id, event_type, consumer, payload in zip(*args):
+                self.add(row_id, event_type, consumer, payload)
+            return f"INSERT 0 {len(args[0])}"
+        if "SET status = 'DONE'" in query:
+            for row_id in args[0]:
+                self.rows[row_id].update(status="DONE", processed_at=time.monotonic())
+            return f"UPDATE {len(args[0])}"
+        if "SET attempts" in query:
+            row_id, attempts, status, error, backoff = args
+            self.rows[row_id].update(
+                attempts=attempts, status=status, last_error=error, next_attempt_at=time.monotonic() + backoff
+            )
+            return "UPDATE 1"
+        if "DELETE FROM event_outbox" in query:
+            cutoff = time.monotonic() - args[0]
+            expired = [k for k, r in self.rows.items() if r["status"] == "DONE" and r["processed_at"] < cutoff]
+            for row_id in expired:
+                del self.rows[row_id]
+            return f"DELETE {len(expired)}"
+        raise AssertionError(f"Unexpected query: {query}")
+
+    async def fetch(self, query, *args):
+        assert "status = 'PENDING'" in query
+        now = time.monotonic()
+        due = [r for r in self.rows.values() if r["status"] == "PENDING" and r["next_attempt_at"] <= now]
+        return sorted(due, key=lambda r: r["created_at"])[:1000]
+
+    def add(self, row_id, event_type, consumer, payload):
+        self.rows[row_id] = {
+            "id": row_id, "event_type": event_type, "consumer": consumer, "payload": payload,
+            "status": "PENDING", "attempts": 0, "last_error": None,
+            "next_attempt_at": time.monotonic(), "created_at": time.monotonic(), "processed_at": None,
+        }
+
+    def statuses(self):
+        return sorted(r["status"] for r in self.rows.values())
+
+
+def make_bus(**kwargs):
+    options = dict(flush_interval=0.001, replay_interval=0.005, retry_backoff=0.001, cleanup_interval=3600)
+    options.update(kwargs)
+    return EventBus(**options)
+
+
+async def run_until(bus, pool, condition, timeout=2.0):
+    await bus.start(pool)
+    try:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "condition not reached"
+            await asyncio.sleep(0.002)
+        await asyncio.sleep(0.01)  # Let the flusher mark the last deliveries DONE
+    finally:
+        await bus.stop()
+
+
+def test_publish_delivers_to_matching_consumers_and_marks_done():
+    bus, pool = make_bus(), FakeOutboxPool()
+    slashes, alerts = [], []
+
+    async def on_slash(event):
+        slashes.append(event)
+
+    async def on_alert(event):
+        alerts.append(event)
+
+    bus.subscribe(SlashTriggered, on_slash)
+    bus.subscribe(ForecastAlert, on_alert)
+
+    async def scenario():
+        bus.publish(SlashTriggered(factory_id="f", pm2_5=210.0, amount=10.0))
+        bus.publish(StatusChanged(factory_id="f", old_status=None, new_status="PENALTY"))
+        await run_until(bus, pool, lambda: slashes)
+
+    asyncio.run(scenario())
+    assert [e.factory_id for e in slashes] == ["f"] and alerts == []
+    # StatusChanged has no consumer, so only one delivery row exists
+    assert pool.statuses() == ["DONE"]
+    assert bus.stats()["consumers"]["on_slash"]["processed"] == 1
+
+
+def test_failed_delivery_is_retried_until_it_succeeds():
+    bus, pool = make_bus(), FakeOutboxPool()
+    calls = []
+
+    async def flaky(event):
+        calls.append(event.event_id)
+        if len(calls) < 3:
+            raise RuntimeError("chain node down")
+
+    bus.subscribe(SlashTriggered, flaky)
+    event = SlashTriggered(factory_id="f", pm2_5=210.0, amount=10.0)
+
+    async def scenario():
+        bus.publish(event)
+        await run_until(bus, pool, lambda: len(calls) == 3)
+
+    asyncio.run(scenario())
+    assert calls == [event.event_id] * 3
+    (row,) = pool.rows.values()
+    assert row["status"] == "DONE" and row["attempts"] == 2
+    assert bus.stats()["consumers"]["flaky"] == {"queued": 0, "processed": 1, "failed": 2}
+
+
+def test_delivery_is_marked_failed_after_max_attempts():
+    bus, pool = make_bus(max_attempts=3), FakeOutboxPool()
+    calls = []
+
+    async def broken(event):
+        calls.append(event)
+        raise RuntimeError("always fails")
+
+    bus.subscribe(SlashTriggered, broken)
+
+    async def scenario():
+        bus.publish(SlashTriggered(factory_id="f", pm2_5=210.0, amount=10.0))
+        await run_until(bus, pool, lambda: pool.statuses() == ["FAILED"])
+        await asyncio.sleep(0.03)
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+    (row,) = pool.rows.values()
+    assert row["attempts"] == 3 and row["last_error"] == "always fails"
+
+
+def test_outbox_write_failure_keeps_events_buffered():
+    bus, pool = make_bus(), FakeOutboxPool()
+    pool.fail_inserts = 2
+    received = []
+
+    async def on_alert(event):
+        received.append(event.predicted_value)
+
+    bus.subscribe(ForecastAlert, on_alert)
+
+    async def scenario():
+        for value in (151.0, 152.0):
+            bus.publish(ForecastAlert(factory_id="f", predicted_value=value, threshold=150.0))
+        await run_until(bus, pool, lambda: len(received) == 2)
+
+    asyncio.run(scenario())
+    assert received == [151.0, 152.0]  # Order kept across the failed flushes
+    assert pool.statuses() == ["DONE", "DONE"]
+
+
+def test_pending_rows_from_a_previous_run_are_replayed():
+    bus, pool = make_bus(), FakeOutboxPool()
+    event = SlashTriggered(factory_id="f", pm2_5=230.0, amount=10.0)
+    payload = {"event_id": event.event_id, "created_at": event.created_at,
+               "factory_id": "f", "pm2_5": 230.0, "amount": 10.0}
+    pool.add("row-1", "SlashTriggered", "on_slash", json.dumps(payload))
+    pool.add("row-2", "UnknownEvent", "on_slash", "{}")
+    received = []
+
+    async def on_slash(e):
+        received.append(e)
+
+    bus.subscribe(SlashTriggered, on_slash)
+    asyncio.run(run_until(bus, pool, lambda: received))
+    assert received == [event]
+    assert pool.rows["row-1"]["status"] == "DONE"
+    assert pool.rows["row-2"]["status"] == "PENDING"
+
+
+def test_deliveries_that_overflow_the_queue_are_replayed_later():
+    bus, pool = make_bus(), FakeOutboxPool()
+    received = []
+
+    async def slow(event):
+        await asyncio.sleep(0.002)
+        received.append(event.predicted_value)
+
+    bus.subscribe(ForecastAlert, slow, max_queue=2)
+
+    async def scenario():
+        for value in range(10):
+            bus.publish(ForecastAlert(factory_id="f", predicted_value=float(value), threshold=150.0))
+        await run_until(bus, pool, lambda: len(received) == 10)
+
+    asyncio.run(scenario())
+    assert sorted(received) == [float(v) for v in range(10)]
+    assert pool.statuses() == ["DONE"] * 10
+
+
+def test_cleanup_deletes_only_expired_done_rows():
+    bus, pool = make_bus(retention_seconds=60), FakeOutboxPool()
+    bus.pool = pool
+    for row_id, status, age in [("old", "DONE", 120), ("new", "DONE", 1), ("failed", "FAILED", 120),
+                                ("pending", "PENDING", 120)]:
+        pool.add(row_id, "ForecastAlert", "c", "{}")
+        pool.rows[row_id].update(status=status, processed_at=time.monotonic() - age)
+
+    asyncio.run(bus._cleanup())
+    assert sorted(pool.rows) == ["failed", "new", "pending"]
+    assert bus.stats()["cleaned_up"] == 1
+
+
+def test_buffer_is_bounded_while_the_outbox_is_unwritable():
+    bus, pool = make_bus(max_buffer=5), FakeOutboxPool()
+    pool.fail_inserts = 10**6
+    bus.subscribe(ForecastAlert, lambda event: None, name="noop")
+    bus.pool = pool
+
+    async def scenario():
+        for value in range(8):
+            bus.publish(ForecastAlert(factory_id="f", predicted_value=float(value), threshold=150.0))
+        await bus._flush()
+        await bus._flush()
+
+    asyncio.run(scenario())
+    assert [e.predicted_value for e in bus._buffer] == [0.0, 1.0, 2.0, 3.0, 4.0]  # Oldest kept, in order
+    assert bus.stats()["dropped"] == 3 and bus.published == 5
+    # Failed flushes back off instead of retrying every flush_interval
+    assert bus._backoff() == pytest.approx(bus.flush_interval * 4)
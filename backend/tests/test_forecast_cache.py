@@ -0,0 +1,72 @@
+import numpy as np
+
+from forecast_cache import ForecastTrajectory, LatestForecasts, TrajectoryCache
+
+
+def make_cache(lead_index=2):
+    cache = TrajectoryCache(tolerance=8.0, lead_index=lead_index)
+    # Forecast made after reading 10: readings 11..20 predicted as 101..110
+    cache.store("f", np.arange(101.0, 111.0), seq=10)
+    return cache
+
+
+def test_remaining_drops_steps_already_observed():
+    trajectory = ForecastTrajectory(np.arange(1.0, 6.0), origin=10)
+    np.testing.assert_array_equal(trajectory.remaining(10), [1, 2, 3, 4, 5])
+    np.testing.assert_array_equal(trajectory.remaining(12), [3, 4, 5])
+    assert trajectory.remaining(20).size == 0
+
+
+def test_reuse_inside_the_tolerance_band_returns_the_lead_value():
+    cache = make_cache()
+    # Two readings since the forecast, each within 8 of what was predicted
+    assert cache.reuse("f", [90.0, 95.0, 108.0, 98.0], seq=12) == 105.0
+    assert cache.stats() == {"inferences": 1, "reuses": 1, "reuse_ratio": 0.5}
+    assert cache.get("f") is not None
+
+
+def test_reading_outside_the_band_invalidates_the_trajectory():
+    cache = make_cache()
+    assert cache.reuse("f", [90.0, 101.0, 120.0], seq=12) is None
+    assert cache.get("f") is None
+    assert cache.reuse("f", [90.0, 101.0, 102.0], seq=12) is None
+    assert cache.stats()["reuses"] == 0
+
+
+def test_no_reuse_without_new_readings_or_past_the_horizon():
+    cache = make_cache()
+    history = [101.0 + i for i in range(10)]
+    # No reading since the forecast: the caller just ran inference
+    assert cache.reuse("f", history[:1], seq=10) is None
+    # Lead value would fall past the last predicted step
+    assert cache.reuse("f", history[:8], seq=18) is None
+    # Not enough history to compare against every predicted step
+    assert cache.reuse("f", history[:2], seq=13) is None
+    # None of these misses are drift, so the trajectory is kept
+    assert cache.get("f") is not None
+    assert cache.reuse("f", history[:7], seq=17) == 110.0
+
+
+def test_unknown_factory_misses():
+    assert make_cache().reuse("other", [100.0] * 5, seq=5) is None
+
+
+def test_latest_forecasts_keeps_the_newest_entry_per_factory():
+    latest = LatestForecasts()
+    trajectory = ForecastTrajectory(np.arange(3.0), origin=4)
+    latest.update("a", np.float32(120.5), np.bool_(False), "t0")
+    latest.update("a", 160.0, True, "t1", trajectory)
+    latest.update("b", 10.0, False, "t1")
+
+    assert len(latest) == 2 and set(latest.factory_ids()) == {"a", "b"}
+    entry = latest.get("a")
+    assert entry == {"predicted_value": 160.0, "breach_predicted": True, "timestamp": "t1", "trajectory": trajectory}
+    assert type(entry["predicted_value"]) is float
+    assert latest.get("b")["trajectory"] is None
+    assert latest.get("c") is None
+
+
+def test_single_output_trajectory_has_no_curve():
+    # A legacy model's lone value is LOOK_FORWARD steps ahead, not the next step
+    trajectory = ForecastTrajectory(np.array([130.0]), origin=10)
+    assert trajectory.remaining(10).size == 0
@@ -0,0 +1,244 @@
+import asyncio
+import struct
+
+import numpy as np
+import pytest
+
+from ingestion import (
+    BINARY_MAGIC, RECORD_DTYPE, IngestQueue, ReadingBatch, RecentReadings, ingest_consumer, parse_binary,
+    parse_ndjson
+)
+
+
+def binary_payload(factory_ids, records):
+    """ Builds a PSR1 payload from factory ids and (factory, timestamp, pm2_5, so2, nox) tuples. """
+    body = BINARY_MAGIC + struct.pack("<H", len(factory_ids))
+    for fid in factory_ids:
+        encoded = fid.encode("utf-8")
+        body += struct.pack("<B", len(encoded)) + encoded
+    return body + struct.pack("<I", len(records)) + np.array(records, dtype=RECORD_DTYPE).tobytes()
+
+
+# --- Binary format ---
+def test_parse_binary_round_trip():
+    batch = parse_binary(binary_payload(
+        ["factory-001", "factory-002"],
+        [(1, 1718000000.5, 91.25, 30.5, 45.5), (0, 1718000001.0, 60.0, 20.0, 30.0)]
+    ))
+    assert batch.factory_ids.tolist() == ["factory-002", "factory-001"]
+    assert batch.pm2_5.tolist() == [91.25, 60.0]
+    assert batch.timestamps.tolist() == [1718000000.5, 1718000001.0]
+    assert batch.pm2_5.dtype == np.float64
+
+
+def test_parse_binary_empty_payload():
+    assert len(parse_binary(binary_payload([], []))) == 0
+
+
+def test_parse_binary_rejects_bad_magic():
+    with pytest.raises(ValueError, match="magic"):
+        parse_binary(b"PSR2" + binary_payload(["f"], [])[4:])
+
+
+@pytest.mark.parametrize("cut", [5, 7, 12, 15, 20])
+def test_parse_binary_rejects_truncated_payload(cut):
+    body = binary_payload(["f"], [(0, 1.0, 1.0, 1.0, 1.0), (0, 2.0, 2.0, 2.0, 2.0)])
+    with pytest.raises(ValueError):
+        parse_binary(body[:-cut])
+
+
+@pytest.mark.parametrize("body", [
+    b"PSR1",
+    b"PSR1\x01",
+    b"PSR1\x01\x00\x01f",
+    b"PSR1\x01\x00\x01f\x00\x00",
+])
+def test_parse_binary_rejects_truncated_header(body):
+    with pytest.raises(ValueError, match="Malformed"):
+        parse_binary(body)
+
+
+def test_parse_binary_rejects_trailing_bytes():
+    with pytest.raises(ValueError, match="trailing"):
+        parse_binary(binary_payload(["f"], [(0, 1.0, 1.0, 1.0, 1.0)]) + b"\x00")
+
+
+def test_parse_binary_rejects_truncated_factory_table():
+    body = BINARY_MAGIC + struct.pack("<H", 2) + struct.pack("<B", 3) + b"abc"
+    with pytest.raises(ValueError):
+        parse_binary(body)
+
+
+def test_parse_binary_rejects_unknown_factory_index():
+    with pytest.raises(ValueError, match="unknown factory"):
+        parse_binary(binary_payload(["f"], [(1, 1.0, 1.0, 1.0, 1.0)]))
+
+
+def test_parse_binary_rejects_invalid_utf8_factory_id():
+    body = BINARY_MAGIC + struct.pack("<H", 1) + struct.pack("<B", 2) + b"\xff\xfe" + struct.pack("<I", 0)
+    with pytest.raises(ValueError):
+        parse_binary(body)
+
+
+@pytest.mark.parametrize("value", [np.nan, np.inf, -np.inf])
+def test_parse_binary_rejects_non_finite_values(value):
+    with pytest.raises(ValueError, match="Non-finite pm2_5 in reading 2"):
+        parse_binary(binary_payload(["f"], [(0, 1.0, 1.0, 1.0, 1.0), (0, 2.0, value, 1.0, 1.0)]))
+
+
+# --- NDJSON format ---
+def test_parse_ndjson_defaults_and_timestamps():
+    batch = parse_ndjson(
+        b'{"factory_id": "a", "pm2_5": 91.2, "so2": null, "timestamp": 1718000000.5}\n'
+        b'\n'
+        b'{"factory_id": "b", "pm2_5": "12.5", "nox": 4, "timestamp": "2024-01-01T00:00:00Z"}\n'
+    )
+    assert batch.factory_ids.tolist() == ["a", "b"]
+    assert batch.pm2_5.tolist() == [91.2, 12.5]
+    assert batch.so2.tolist() == [0.0, 0.0]
+    assert batch.nox.tolist() == [0.0, 4.0]
+    assert batch.timestamps.tolist() == [1718000000.5, 1704067200.0]
+
+
+@pytest.mark.parametrize("line", [
+    b'{"factory_id": "a", "pm2_5": NaN}',
+    b'{"factory_id": "a", "pm2_5": Infinity}',
+    b'{"factory_id": "a", "pm2_5": 1e999}',
+    b'{"factory_id": "a", "pm2_5": 1, "so2": -Infinity}',
+    b'{"factory_id": "a", "pm2_5": true}',
+    b'{"factory_id": "a", "pm2_5": 1, "nox": false}',
+    b'{"factory_id": "a", "pm2_5": 1, "timestamp": true}',
+    b'{"factory_id": "a", "pm2_5": [1]}',
+    b'{"factory_id": "a"}',
+    b'{"factory_id": "a", "pm2_5": 1',
+])
+def test_parse_ndjson_rejects_invalid_readings(line):
+    with pytest.raises(ValueError, match="line 2"):
+        parse_ndjson(b'{"factory_id": "ok", "pm2_5": 1}\n' + line)
+
+
+# --- Rolling windows ---
+def test_recent_readings_tracks_peak_since_last_check():
+    recent = RecentReadings(window=3)
+    assert recent.pop_peak("a") is None
+    for value in (120.0, 250.0, 90.0):
+        recent.add("a", {"pm2_5": value})
+    assert recent.latest("a")["pm2_5"] == 90.0
+    assert recent.peak("a")["pm2_5"] == 250.0
+    assert recent.pop_peak("a")["pm2_5"] == 250.0
+    # Reset by the check: only readings after it count
+    assert recent.pop_peak("a") is None
+    recent.add("a", {"pm2_5": 80.0})
+    assert recent.pop_peak("a")["pm2_5"] == 80.0
+
+
+def test_recent_readings_add_batch_orders_by_timestamp():
+    recent = RecentReadings(window=3)
+    recent.add_batch(ReadingBatch(
+        ["a", "b", "a", "a", "a"], [4.0, 9.0, 1.0, 3.0, 2.0], [0.0] * 5, [0.0] * 5, [40, 10, 10, 30, 20]
+    ))
+    assert recent.history("a") == [2.0, 3.0, 4.0]
+    assert recent.count("a") == 4
+    assert recent.latest("a")["pm2_5"] == 4.0
+    assert recent.pop_updated() == {"a", "b"}
+    assert recent.pop_updated() == set()
+
+
+# --- Backpressure ---
+def make_batch(n):
+    return ReadingBatch(["f"] * n, np.ones(n), np.zeros(n), np.zeros(n), np.arange(n, dtype=float))
+
+
+def test_ingest_queue_is_bounded_by_readings():
+    queue = IngestQueue(max_readings=10)
+    assert queue.offer(make_batch(6))
+    assert not queue.offer(make_batch(5))
+    assert queue.offer(make_batch(4))
+    assert (queue.pending, queue.accepted_total, queue.rejected_total) == (10, 10, 5)
+
+    taken = asyncio.run(queue.take(8))
+    assert len(taken) == 6  # Whole batches only; the next one would exceed max_readings
+    assert queue.pending == 4
+    assert queue.retry_after_seconds(drain_rate=0.0) == 1
+    assert queue.retry_after_seconds(drain_rate=2.0) == 2
+
+
+def test_recent_readings_add_batch_matches_sequential_add():
+    rng = np.random.default_rng(3)
+    n = 2000
+    batch = ReadingBatch(
+        rng.choice(["a", "b", "c"], n), rng.uniform(0, 300, n).round(1), rng.uniform(0, 50, n),
+        rng.uniform(0, 50, n), rng.permutation(n).astype(float)
+    )
+    grouped, sequential = RecentReadings(window=20), RecentReadings(window=20)
+    sequential.add("a", {"pm2_5": 500.0})  # Existing peak above anything in the batch
+    grouped.add("a", {"pm2_5": 500.0})
+    grouped.add_batch(batch)
+    for i in np.argsort(batch.timestamps, kind="stable"):
+        sequential.add(batch.factory_ids[i], {
+            "pm2_5": float(batch.pm2_5[i]), "so2": float(batch.so2[i]),
+            "nox": float(batch.nox[i]), "timestamp": float(batch.timestamps[i]),
+        })
+
+    for fid in ("a", "b", "c"):
+        assert grouped.history(fid) == sequential.history(fid)
+        assert grouped.latest(fid) == sequential.latest(fid)
+        assert grouped.count(fid) == sequential.count(fid)
+        assert grouped.peak(fid) == sequential.peak(fid)
+    assert grouped.pop_updated() == sequential.pop_updated()
+
+
+# --- Consumer ---
+class FlakyPool:
+    """ Pool whose INSERTs fail `failures` times before succeeding. """
+    def __init__(self, failures):
+        self.failures = failures
+        self.written = []
+
+    def acquire(self):
+        pool = self
+
+        class Conn:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, query, *args):
+                if pool.failures:
+                    pool.failures -= 1
+                    raise ConnectionError("connection reset")
+                pool.written.extend(args[1])
+
+        return Conn()
+
+
+def run_consumer(pool, queue, recent, stats, until, **kwargs):
+    async def scenario():
+        task = asyncio.create_task(ingest_consumer(pool, queue, recent, stats, retry_backoff=0.001, **kwargs))
+        for _ in range(1000):
+            if until():
+                break
+            await asyncio.sleep(0.002)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_ingest_consumer_retries_failed_writes():
+    pool, queue, recent, stats = FlakyPool(failures=2), IngestQueue(), RecentReadings(), {}
+    queue.offer(make_batch(5))
+    run_consumer(pool, queue, recent, stats, lambda: pool.written)
+    assert pool.written == [1.0] * 5
+    assert stats["written_total"] == 5 and stats["write_errors"] == 2
+    assert "failed_total" not in stats
+    assert recent.count("f") == 5 and queue.pending == 0
+
+
+def test_ingest_consumer_drops_batch_after_max_attempts():
+    pool, queue, recent, stats = FlakyPool(failures=3), IngestQueue(), RecentReadings(), {}
+    queue.offer(make_batch(5))
+    run_consumer(pool, queue, recent, stats, lambda: "failed_total" in stats, max_attempts=3)
+    assert stats["failed_total"] == 5 and pool.written == []
+    assert recent.count("f") == 0 and queue.pending == 0
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from scheduler import MonitorScheduler
+
+
+def make_scheduler(**kwargs):
+    options = dict(threshold=150.0, min_interval=1.0, max_interval=30.0, max_checks_per_second=10.0, jitter=0.0)
+    options.update(kwargs)
+    return MonitorScheduler(**options)
+
+
+def test_due_factories_pop_earliest_deadline_first():
+    scheduler = make_scheduler()
+    now = time.monotonic()
+    scheduler.schedule("late", 3.0, now)
+    scheduler.schedule("early", 1.0, now)
+    scheduler.schedule("future", 60.0, now)
+
+    assert scheduler.pop_due(now + 5.0) == ["early", "late"]
+    assert "future" in scheduler and len(scheduler) == 1
+    assert scheduler.stats()["checks"] == 2
+
+
+def test_rate_cap_leaves_the_rest_queued_until_tokens_refill():
+    scheduler = make_scheduler(max_checks_per_second=5.0)
+    now = time.monotonic()
+    for i in range(12):
+        scheduler.schedule(f"f{i}", 0.0, now)
+
+    assert scheduler.pop_due(now) == [f"f{i}" for i in range(5)]
+    assert scheduler.pop_due(now) == []
+    assert scheduler.seconds_until_next(now) == pytest.approx(0.2)
+
+    # Half a second refills 2.5 tokens
+    assert scheduler.pop_due(now + 0.5) == ["f5", "f6"]
+    # The bucket never holds more than one second's worth
+    assert len(scheduler.pop_due(now + 60.0)) == 5
+
+
+def test_expedite_pulls_a_check_forward_and_supersedes_the_old_deadline():
+    scheduler = make_scheduler()
+    now = time.monotonic()
+    scheduler.schedule("f", 30.0, now)
+    scheduler.expedite("f", now + 1.0)
+
+    assert scheduler.pop_due(now + 1.0) == ["f"]
+    # The stale 30 s heap entry is skipped, not checked a second time
+    assert scheduler.pop_due(now + 31.0) == []
+    assert scheduler.stats()["checks"] == 1
+
+
+def test_expedite_never_delays_an_earlier_check():
+    scheduler = make_scheduler()
+    now = time.monotonic()
+    scheduler.schedule("f", 0.0, now)
+    scheduler.expedite("f", now + 5.0)
+    assert scheduler.pop_due(now + 0.5) == ["f"]
+
+
+def test_alert_and_penalty_are_checked_every_min_interval():
+    scheduler = make_scheduler()
+    calm_history = [20.0] * 20
+    assert scheduler.interval_for("ALERT", calm_history) == 1.0
+    assert scheduler.interval_for("PENALTY", calm_history) == 1.0
+    assert scheduler.interval_for("NORMAL", []) == 1.0
+
+
+def test_calm_factories_far_below_threshold_back_off_to_max_interval():
+    scheduler = make_scheduler()
+    assert scheduler.interval_for("NORMAL", [20.0] * 20) == pytest.approx(30.0)
+
+    near = scheduler.interval_for("NORMAL", [120.0] * 20)
+    volatile = scheduler.interval_for("NORMAL", [20.0, 60.0] * 10)
+    assert 1.0 < near < 30.0
+    assert 1.0 < volatile < 30.0
+    assert scheduler.interval_for("NORMAL", [160.0] * 20) == 1.0
+
+
+def test_reschedule_applies_jitter_within_bounds():
+    scheduler = make_scheduler(jitter=0.1)
+    now = time.monotonic()
+    for i in range(50):
+        scheduler.reschedule(f"f{i}", "NORMAL", [20.0] * 20, now)
+    deadlines = [due - now for due in scheduler._due.values()]
+    assert min(deadlines) >= 27.0 and max(deadlines) <= 33.0
+    assert len(set(deadlines)) > 1
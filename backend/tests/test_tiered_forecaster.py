@@ -0,0 +1,85 @@
+import numpy as np
+
+from forecast_cache import TrajectoryCache
+from tiered_forecaster import TieredForecaster, statistical_forecast
+
+
+class FakeForecaster:
+    """ Stands in for LSTMForecaster: every trajectory is flat at `value`. """
+    look_back = 5
+    lead = 3
+    horizon = 10
+
+    def __init__(self, value, available=True):
+        self.value = value
+        self.available = available
+        self.windows = 0
+
+    def lead_index(self):
+        return self.lead - 1
+
+    def predict_trajectories(self, windows):
+        if not self.available:
+            return np.empty((0, self.horizon))
+        self.windows += len(windows)
+        return np.full((len(windows), self.horizon), self.value)
+
+
+def tiered(value, audit_rate=0.0, available=True):
+    forecaster = FakeForecaster(value, available)
+    cache = TrajectoryCache(tolerance=8.0, lead_index=forecaster.lead_index())
+    return TieredForecaster(forecaster, cache, threshold=150.0, margin=30.0, audit_rate=audit_rate), cache
+
+
+def test_statistical_forecast_extrapolates_linear_trend():
+    windows = np.array([[10.0, 20.0, 30.0, 40.0, 50.0], [80.0] * 5])
+    np.testing.assert_allclose(statistical_forecast(windows, 3), [[60.0, 70.0, 80.0], [80.0] * 3])
+
+
+def test_calm_factories_skip_the_lstm_and_near_ones_use_it():
+    forecaster, cache = tiered(value=140.0)
+    predictions = forecaster.forecast({"calm": [50.0] * 5, "near": [125.0] * 5}, {"calm": 5, "near": 5})
+    assert predictions == {"calm": 50.0, "near": 140.0}
+    assert forecaster.forecaster.windows == 1
+    assert cache.get("near") is not None and cache.get("calm") is None
+    stats = forecaster.stats()
+    assert stats["lstm_calls"] == 1 and stats["lstm_avoided_fraction"] == 0.5
+
+
+def test_audit_that_finds_an_alert_returns_the_lstm_forecast():
+    forecaster, cache = tiered(value=170.0, audit_rate=1.0)
+    predictions = forecaster.forecast({"calm": [50.0] * 5}, {"calm": 5})
+    assert predictions == {"calm": 170.0}
+    assert cache.get("calm") is not None
+    stats = forecaster.stats()
+    assert stats["audited"] == 1 and stats["audit_missed_alerts"] == 1
+
+
+def test_audit_without_an_alert_keeps_the_cheap_forecast():
+    forecaster, cache = tiered(value=120.0, audit_rate=1.0)
+    assert forecaster.forecast({"calm": [50.0] * 5}, {"calm": 5}) == {"calm": 50.0}
+    assert cache.get("calm") is None
+    assert forecaster.stats()["audit_missed_alerts"] == 0
+
+
+def test_trajectories_back_only_lstm_derived_predictions():
+    forecaster, cache = tiered(value=140.0)
+    forecaster.forecast({"calm": [50.0] * 5, "near": [125.0] * 5}, {"calm": 5, "near": 5})
+    assert set(forecaster.trajectories) == {"near"}
+    stored = forecaster.trajectories["near"]
+
+    # Next tick the near factory reuses its cached trajectory, the calm one
+    # stays statistical and gets no trajectory even if a stale one is cached
+    cache.store("calm", np.full(10, 60.0), 1)
+    forecaster.forecast({"calm": [50.0] * 6, "near": [125.0] * 5 + [140.0]}, {"calm": 6, "near": 6})
+    assert forecaster.trajectories == {"near": stored}
+
+
+def test_unavailable_model_falls_back_without_counting_as_avoided():
+    forecaster, cache = tiered(value=140.0, available=False)
+    predictions = forecaster.forecast({"calm": [50.0] * 5, "near": [125.0] * 5}, {"calm": 5, "near": 5})
+    assert predictions == {"calm": 50.0, "near": 125.0}
+    assert forecaster.trajectories == {} and cache.get("near") is None
+    stats = forecaster.stats()
+    assert stats["lstm_unavailable"] == 1 and stats["statistical_only"] == 1
+    assert stats["lstm_avoided_fraction"] == 0.5
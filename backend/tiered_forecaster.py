@@ -0,0 +1,202 @@
+from typing import Dict, List
+
+import numpy as np
+
+from ai_forecaster import LSTMForecaster
+from forecast_cache import ForecastTrajectory, TrajectoryCache
+
+
+def _forecast_weights(length: int, alpha: float):
+    """
+    Per-position weights shared by the statistical forecasters: EWMA
+    weights, least-squares slope weights, and the EWMA's lag in steps.
+    """
+    age = np.arange(length - 1, -1, -1, dtype=np.float64)  # 0 for the newest reading
+
+    # EWMA weights, normalized so short windows aren't biased towards zero
+    weights = alpha * (1 - alpha) ** age
+    weights /= weights.sum()
+
+    # Least-squares slope: slope = window @ slope_weights
+    x = np.arange(length, dtype=np.float64)
+    x -= x.mean()
+    slope_weights = x / (x @ x)
+
+    # The EWMA lags a trending series by its mean age; shift it back to "now"
+    lag = weights @ age
+    return weights, slope_weights, lag
+
+
+def statistical_forecast(windows: np.ndarray, steps: int, alpha: float = 0.3) -> np.ndarray:
+    """
+    Cheap first-tier forecaster: EWMA level plus least-squares linear
+    trend, computed for every window at once with two matrix-vector products.
+    
+    Args:
+        windows: Array of shape (n_factories, look_back), chronological.
+        steps: Number of future steps to forecast.
+        alpha: EWMA smoothing factor (higher reacts faster).
+        
+    Returns:
+        Array of shape (n_factories, steps); column j is j+1 steps ahead.
+    """
+    windows = np.asarray(windows, dtype=np.float64)
+    weights, slope_weights, lag = _forecast_weights(windows.shape[1], alpha)
+    level = windows @ weights
+    slope = windows @ slope_weights
+    now = level + slope * lag
+    return now[:, None] + slope[:, None] * np.arange(1, steps + 1)
+
+
+def rolling_statistical_forecast(series: np.ndarray, look_back: int, lead: int,
+                                 alpha: float = 0.3) -> np.ndarray:
+    """
+    statistical_forecast() at every position of many series at once, for
+    offline replay. Accumulates `look_back` shifted slices instead of
+    materializing every window, so memory stays O(series.size).
+    
+    Args:
+        series: Array of shape (n_factories, n_steps), chronological.
+        look_back: Window length.
+        lead: Steps ahead to forecast.
+        
+    Returns:
+        Array of shape (n_factories, n_steps); [i, t] is the forecast made
+        after reading t for reading t + lead. NaN where t < look_back - 1.
+    """
+    series = np.asarray(series, dtype=np.float64)
+    n_steps = series.shape[1]
+    forecast = np.full(series.shape, np.nan)
+    if n_steps < look_back:
+        return forecast
+
+    weights, slope_weights, lag = _forecast_weights(look_back, alpha)
+    width = n_steps - look_back + 1
+    level = np.zeros((series.shape[0], width))
+    slope = np.zeros((series.shape[0], width))
+    for k in range(look_back):
+        window_slice = series[:, k:k + width]
+        level += weights[k] * window_slice
+        slope += slope_weights[k] * window_slice
+    forecast[:, look_back - 1:] = level + slope * (lag + lead)
+    return forecast
+
+
+class TieredForecaster:
+    """
+    Forecasts many factories per tick in up to three tiers:
+    1. reuse a cached LSTM trajectory while readings stay within tolerance,
+    2. a vectorized statistical forecast over all remaining factories,
+    3. one batched LSTM pass, only for factories whose cheap forecast (or
+       latest reading) is within `margin` of the alert threshold.
+    A small random sample of the factories tier 2 cleared is also sent to
+    the LSTM (`audit_rate`) to estimate how many alerts the filter misses.
+    """
+    def __init__(self, forecaster: LSTMForecaster, cache: TrajectoryCache,
+                 threshold: float, margin: float, audit_rate: float = 0.05):
+        self.forecaster = forecaster
+        self.cache = cache
+        self.threshold = threshold
+        self.margin = margin
+        self.audit_rate = audit_rate
+        self.counters = {
+            "forecasts": 0,
+            "cache_hits": 0,
+            "statistical_only": 0,
+            "lstm_calls": 0,
+            "lstm_alerts": 0,
+            "audited": 0,
+            "audit_missed_alerts": 0,
+            "lstm_unavailable": 0,
+        }
+        # The trajectory behind each LSTM-derived prediction of the last
+        # forecast() call; statistical predictions have none
+        self.trajectories: Dict[str, ForecastTrajectory] = {}
+
+    def forecast(self, histories: Dict[str, List[float]], seqs: Dict[str, int]) -> Dict[str, float]:
+        """
+        Returns the headline (lead-steps-ahead) forecast for each factory.
+        `histories` must hold at least look_back readings per factory.
+        """
+        predictions: Dict[str, float] = {}
+        self.trajectories = {}
+        pending = []
+        for factory_id, history in histories.items():
+            cached = self.cache.reuse(factory_id, history, seqs[factory_id])
+            if cached is not None:
+                predictions[factory_id] = cached
+                self.trajectories[factory_id] = self.cache.get(factory_id)
+                self.counters["cache_hits"] += 1
+            else:
+                pending.append(factory_id)
+        self.counters["forecasts"] += len(histories)
+        if not pending:
+            return predictions
+
+        look_back = self.forecaster.look_back
+        windows = np.array([histories[fid][-look_back:] for fid in pending], dtype=np.float64)
+        lead = self.forecaster.lead
+        cheap = statistical_forecast(windows, lead)[:, lead - 1]
+
+        # Tier 3 gate: anything plausibly near the threshold goes to the LSTM
+        near = np.maximum(cheap, windows[:, -1]) >= self.threshold - self.margin
+        audit = ~near & (np.random.random(len(pending)) < self.audit_rate)
+        run_lstm = near | audit
+
+        trajectories = self.forecaster.predict_trajectories(windows[run_lstm])
+        lstm_ok = len(trajectories) == int(run_lstm.sum())
+        lead_index = self.forecaster.lead_index()
+
+        lstm_row = 0
+        for i, factory_id in enumerate(pending):
+            if not run_lstm[i]:
+                predictions[factory_id] = round(float(cheap[i]), 2)
+                self.counters["statistical_only"] += 1
+                continue
+            if not lstm_ok:
+                # The filter wanted the LSTM but the model is unavailable: the
+                # cheap forecast is a fallback, not an avoided call
+                predictions[factory_id] = round(float(cheap[i]), 2)
+                self.counters["lstm_unavailable"] += 1
+                continue
+
+            trajectory = trajectories[lstm_row]
+            lstm_row += 1
+            lstm_value = float(trajectory[lead_index])
+            if audit[i]:
+                # Audit: the cheap tier's answer stands unless the LSTM, having
+                # run anyway, flags a breach the filter missed
+                self.counters["audited"] += 1
+                self.counters["statistical_only"] += 1
+                if lstm_value > self.threshold:
+                    self.counters["audit_missed_alerts"] += 1
+                    self.cache.store(factory_id, trajectory, seqs[factory_id])
+                    self.trajectories[factory_id] = self.cache.get(factory_id)
+                    predictions[factory_id] = lstm_value
+                else:
+                    predictions[factory_id] = round(float(cheap[i]), 2)
+                continue
+
+            self.cache.store(factory_id, trajectory, seqs[factory_id])
+            self.trajectories[factory_id] = self.cache.get(factory_id)
+            self.counters["lstm_calls"] += 1
+            if lstm_value > self.threshold:
+                self.counters["lstm_alerts"] += 1
+            predictions[factory_id] = lstm_value
+
+        return predictions
+
+    def stats(self) -> dict:
+        c = self.counters
+        uncached = c["forecasts"] - c["cache_hits"]
+        # Alerts the filter suppressed, extrapolated from the audit sample
+        estimated_missed = c["audit_missed_alerts"] / self.audit_rate if self.audit_rate else 0.0
+        alerts = c["lstm_alerts"] + estimated_missed
+        return {
+            **c,
+            "margin": self.margin,
+            "audit_rate": self.audit_rate,
+            # Audited factories did cost an LSTM call, so they don't count as avoided
+            "lstm_avoided_fraction": round((c["statistical_only"] - c["audited"]) / uncached, 3) if uncached else 0.0,
+            "estimated_alert_recall": round(c["lstm_alerts"] / alerts, 3) if alerts else 1.0,
+        }
@@ -14,7 +14,8 @@ SCALER_SAVE_PATH = "scaler.joblib"
 
 # These MUST match how we query the model later
 LOOK_BACK = 20  # Use 20 previous readings
-LOOK_FORWARD = 3 # To predict 3 steps into the future
+LOOK_FORWARD = 3 # Headline forecast is 3 steps into the future
+HORIZON = 10     # The model outputs the whole next-10-steps trajectory (must be >= LOOK_FORWARD)
 
 # --- 1. Load and Preprocess Data ---
 print("Loading and preprocessing data...")
@@ -29,16 +30,16 @@ scaled_data = scaler.fit_transform(pm_data)
 # --- 2. Create Sequences ---
 # This function converts our data into [X, y] pairs
 # X = a sequence of 'LOOK_BACK' readings
-# y = the reading 'LOOK_FORWARD' steps in the future
-def create_sequences(data, look_back, look_forward):
+# y = the next 'HORIZON' readings (y[:, LOOK_FORWARD - 1] is the headline value)
+def create_sequences(data, look_back, horizon):
     X, y = [], []
-    for i in range(len(data) - look_back - look_forward):
+    for i in range(len(data) - look_back - horizon):
         X.append(data[i:(i + look_back), 0])
-        y.append(data[i + look_back + look_forward - 1, 0])
+        y.append(data[(i + look_back):(i + look_back + horizon), 0])
     return np.array(X), np.array(y)
 
-print(f"Creating sequences with look_back={LOOK_BACK}, look_forward={LOOK_FORWARD}...")
-X, y = create_sequences(scaled_data, LOOK_BACK, LOOK_FORWARD)
+print(f"Creating sequences with look_back={LOOK_BACK}, horizon={HORIZON}...")
+X, y = create_sequences(scaled_data, LOOK_BACK, HORIZON)
 
 # Reshape X for LSTM input: [samples, time_steps, features]
 X = np.reshape(X, (X.shape[0], X.shape[1], 1))
@@ -65,7 +66,7 @@ model.add(Dropout(0.2)) # Prevent overfitting
 model.add(LSTM(units=50, return_sequences=False))
 model.add(Dropout(0.2))
 # Output layer
-model.add(Dense(units=1)) # Predicts a single value
+model.add(Dense(units=HORIZON)) # Predicts the next HORIZON values in one pass
 
 # Compile the model
 model.compile(optimizer='adam', loss='mean_squared_error')
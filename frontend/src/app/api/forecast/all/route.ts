@@ -1,10 +1,31 @@
 import { NextRequest, NextResponse } from 'next/server'
 
+const PYTHON_BACKEND_URL = 'http://127.0.0.1:8000'
+
 /**
  * GET /api/forecast/all
  * Returns forecasts for all factories
+ *
+ * One request to the backend's /api/forecast, which serves every factory's
+ * latest forecast from memory, instead of one call per factory.
  */
 export async function GET() {
+  try {
+    const response = await fetch(`${PYTHON_BACKEND_URL}/api/forecast`, {
+      cache: 'no-store',
+    })
+
+    if (!response.ok) {
+      throw new Error(`Backend responded with ${response.status}`)
+    }
+
+    const data = await response.json()
+    return NextResponse.json(data.forecasts)
+  } catch (backendError) {
+    console.error('Python backend connection failed:', backendError)
+  }
+
+  // Fallback mock forecasts if the backend is offline
   const factories = ['Bhilai-001', 'Mumbai-002', 'Delhi-003', 'Chennai-004', 'Kolkata-005']
   
   const forecasts = factories.map((factoryId) => ({